@@ -1,13 +1,44 @@
 import asyncio
+import json
+import math
+import os
+import shutil
+import time
 import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Literal
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.requests import ClientDisconnect
 
-from .core.ffmpeg import build_cpu_cmd, run_ffmpeg
-from .core.hw import detect_hw_caps, choose_encoder
+from . import metrics
+
+from .core.affinity import CorePool, ResourceLimits
+from .core.cache import command_key, input_fingerprint, result_cache
+from .core.chunked import DEFAULT_SEGMENT_SECONDS, run_chunked
+from .core.control import JobControl
+from .core.ingest import BodyPipe, is_streamable, spool, upload_dir
+from .core.ffmpeg import FfmpegError, build_cpu_cmd, run_ffmpeg
+from .core.jobstore import FINISHED_STATUSES, JobStore
+from .core.hw import detect_hw_caps, choose_encoder, ffmpeg_version
+from .core.calibrate import EncodeTarget, load_profile
+from .core.models import PipelineSpec
+from .core.pipeline import compile_pipeline
+from .core.presets import preset_registry
+from .core.live import LIVE_MODES, MEDIA_TYPES, live_output_args, live_output_path
+from .core.probe import MediaInfo, probe
+from .core.progress import ProgressTracker
+from .core.remux import plan_streams
+from .core.usage import ResourceUsage
+from .scheduler import DEFAULT_PRIORITY, PRIORITIES, AdmissionController, ClientQueueFull, JobQueue, QueueFull, encoder_factor, estimate_cost
+
+
+Priority = Literal["interactive", "normal", "bulk"]
 
 
 class RunRequest(BaseModel):
@@ -16,24 +47,324 @@ class RunRequest(BaseModel):
     output_dir: str
     output_format: str  # e.g. mp4, mp3, webp, wav
     options: dict = {}  # Additional options (AI upscaling, quality, etc.)
+    # Scheduling: jobs share workers fairly per client, weighted by priority
+    priority: Priority = DEFAULT_PRIORITY
+    client: str | None = None  # defaults to the X-Client-Id header, then the peer address
     # Optional preset/config future extension
     config_path: str | None = None
     preset_path: str | None = None
 
 
-# In-memory job storage (replace with database in production)
-jobs: Dict[str, Dict[str, Any]] = {}
+class PipelineRequest(BaseModel):
+    # Run a YAML pipeline (preset name, inline spec or config file) as one ffmpeg process
+    input_path: str | None = None  # defaults to the decode step's 'input' param
+    output_dir: str
+    preset: str | None = None
+    config_path: str | None = None
+    spec: dict | None = None
+    options: dict = {}
+    priority: Priority = DEFAULT_PRIORITY
+    client: str | None = None
+
+
+# Job records: SQLite-backed, shared by API processes on this host. Opened
+# on first use, so importing the API (as the CLI does) touches no disk.
+_jobs: JobStore | None = None
+
+
+def job_store() -> JobStore:
+    global _jobs
+    if _jobs is None:
+        _jobs = JobStore.from_env()
+    return _jobs
+
+
+@dataclass
+class _Execution:
+    """One running conversion shared by every job that asked for it."""
+    key: str
+    job_ids: List[str] = field(default_factory=list)
+    runner: str = ""  # Job id the conversion was queued under
+    # Highest class among the attached jobs, and the runner's control once it runs
+    priority: str = DEFAULT_PRIORITY
+    control: JobControl | None = None
+
+
+# In-flight executions by request key, and the execution each job is attached to
+executions: Dict[str, _Execution] = {}
+_job_execution: Dict[str, _Execution] = {}
+# Uploads being streamed into ffmpeg, by job id
+_upload_pipes: Dict[str, BodyPipe] = {}
+
+
+def _request_key(input_path: Path, output_path: Path, output_format: str, options: dict) -> str:
+    st = input_path.stat()
+    return json.dumps(
+        [str(input_path.resolve()), st.st_size, st.st_mtime_ns, str(output_path.resolve()), output_format, options],
+        sort_keys=True, default=str,
+    )
+
+
+def _memory_limit(options: dict) -> int | None:
+    """Optional per-job memory rlimit: memory_limit_mb option, else FLUXCONVERTER_JOB_MEMORY_LIMIT_MB."""
+    mb = options.get("memory_limit_mb") or os.environ.get("FLUXCONVERTER_JOB_MEMORY_LIMIT_MB")
+    return int(mb) * 1024 * 1024 if mb else None
+
+
+def _output_bytes(output_path: Path, live_mode: str | None) -> int:
+    if live_mode == "hls":
+        return sum(p.stat().st_size for p in output_path.parent.iterdir() if p.is_file())
+    return output_path.stat().st_size if output_path.exists() else 0
+
+
+def _update_job(job_id: str, **fields: Any) -> None:
+    """Apply fields to a job and to every job coalesced onto the same execution."""
+    execution = _job_execution.get(job_id)
+    for jid in execution.job_ids if execution else [job_id]:
+        job_store().update(jid, **fields)
+        if fields.get("status") in FINISHED_STATUSES:
+            metrics.jobs_total.inc(fields["status"])
+    _notify_changed()
+
+
+# Set (and replaced) whenever a job changes; progress streams wait on it
+_changed: asyncio.Event | None = None
+
+
+def _notify_changed() -> None:
+    global _changed
+    event, _changed = _changed, asyncio.Event()
+    if event is not None:
+        event.set()
+
+
+async def _wait_changed(timeout: float) -> bool:
+    try:
+        await asyncio.wait_for(_changed.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def _add_job(job_id: str, job: Dict[str, Any]) -> None:
+    job_store()[job_id] = job
+    _notify_changed()
+
+# Admits conversions while their estimated cost fits the host budget
+admission: AdmissionController | None = None
+# Gives every admitted job its own cores (NUMA-local where possible)
+core_pool = CorePool()
+# Bounded queue of accepted jobs and the fixed worker pool draining it
+job_queue: JobQueue | None = None
+# _changed, admission and job_queue bind to the event loop that first uses
+# them, so each app lifespan creates its own (see _lifespan)
+
+
+def _check_queue(client: str) -> None:
+    """Refuse new work with 503 + Retry-After while the queue is full, 429 if the client is over its share."""
+    try:
+        job_queue.check(client)
+    except ClientQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def _client_id(request: Request, client: str | None) -> str:
+    return client or request.headers.get("x-client-id") or (request.client.host if request.client else "")
+
+# How often live endpoints re-check for new output, and how long they wait for the first bytes
+LIVE_POLL_SECONDS = 0.2
+LIVE_WAIT_SECONDS = 30.0
+
+# Progress streams wake on local changes, re-check the store (for other
+# processes' jobs) at least this often, and push at most this often
+EVENT_POLL_SECONDS = 1.0
+EVENT_COALESCE_SECONDS = 0.25
+# Jobs returned per /status?since= page
+STATUS_PAGE_SIZE = 1000
+
+
+def _job_finished(job_id: str) -> bool:
+    return job_store()[job_id]["status"] in FINISHED_STATUSES
+
+
+async def _tail_file(job_id: str, path: Path, chunk_size: int = 64 * 1024):
+    """Yield a file's bytes as ffmpeg appends them, until the job finishes."""
+    while job_store()[job_id]["status"] == "queued" or not path.exists():
+        if _job_finished(job_id):
+            return
+        await asyncio.sleep(LIVE_POLL_SECONDS)
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(chunk_size)
+            if data:
+                yield data
+                continue
+            if _job_finished(job_id):
+                rest = f.read()
+                if rest:
+                    yield rest
+                return
+            await asyncio.sleep(LIVE_POLL_SECONDS)
+
+
+async def _job_changes(job_ids: List[str] | None, since: int = 0):
+    """Yield batches of changed jobs as they change, coalesced.
+
+    With job_ids, ends once all of them have finished; without, follows
+    every job indefinitely. Yields an empty batch when nothing changed
+    for EVENT_POLL_SECONDS, so callers can send keepalives.
+    """
+    # Given jobs are compared by content: progress between batched writes
+    # keeps its version, but is in memory here already
+    sent: Dict[str, Dict[str, Any]] = {}
+    cursor = since
+    while True:
+        if job_ids:
+            batch = []
+            for jid in job_ids:
+                job = job_store().get(jid)
+                if job is None or job == sent.get(jid):
+                    continue
+                if jid not in sent and job.get("version", 0) <= since:
+                    continue  # The client saw this write before it reconnected
+                sent[jid] = job
+                batch.append(job)
+        else:
+            batch, cursor = job_store().changed_since(cursor, STATUS_PAGE_SIZE)
+        if batch:
+            yield batch
+        if job_ids and all((job := job_store().get(jid)) is None or job["status"] in FINISHED_STATUSES for jid in job_ids):
+            return
+        if not batch and not await _wait_changed(EVENT_POLL_SECONDS):
+            yield []
+            continue
+        await asyncio.sleep(EVENT_COALESCE_SECONDS)
+
+
+async def _progress_lines(job_id: str):
+    async for batch in _job_changes([job_id]):
+        for job in batch:
+            yield json.dumps(job, default=str) + "\n"
+
+
+async def _sse_events(job_ids: List[str] | None, since: int):
+    async for batch in _job_changes(job_ids, since):
+        if not batch:
+            yield ": keepalive\n\n"
+        for job in batch:
+            yield f"id: {job['version']}\nevent: job\ndata: {json.dumps(job, default=str)}\n\n"
+
+
+def _drop_execution(execution: _Execution) -> None:
+    if executions.get(execution.key) is execution:
+        del executions[execution.key]
+    for jid in [execution.runner, *execution.job_ids]:
+        if _job_execution.get(jid) is execution:
+            del _job_execution[jid]
+
+
+def _start_conversion(
+    job_id: str, key: str, input_path: Path, output_path: Path, output_format: str, options: dict,
+    priority: str = DEFAULT_PRIORITY, client: str = "", force: bool = False,
+) -> None:
+    # Queue first: a full queue must not leave a dangling execution behind
+    job_queue.submit(
+        partial(process_conversion, job_id, input_path, output_path, output_format, options),
+        force=force, priority=priority, client=client, key=job_id,
+    )
+    execution = executions[key] = _Execution(key, [job_id], job_id, priority)
+    _job_execution[job_id] = execution
+
+
+async def _join_execution(execution: _Execution, job_id: str, priority: str) -> None:
+    """Attach a job to an in-flight execution, raising the execution to the job's class."""
+    execution.job_ids.append(job_id)
+    _job_execution[job_id] = execution
+    if PRIORITIES[priority] <= PRIORITIES[execution.priority]:
+        return
+    execution.priority = priority
+    # Requeue it if it hasn't started; otherwise it must not be paused any more
+    if not job_queue.reprioritize(execution.runner, priority) and execution.control is not None:
+        await admission.promote(execution.control, priority)
+
+
+async def _resume_job(job: Dict[str, Any]) -> None:
+    """Restart a job recovered from the store after a restart."""
+    job_id, options = job["id"], job.get("options") or {}
+    priority, client = job.get("priority", DEFAULT_PRIORITY), job.get("client", "")
+    upload = job.get("upload")
+    if upload is not None and upload["mode"] == "pipe":
+        _update_job(job_id, status="failed", error="Upload was interrupted by a restart")
+        return
+    input_path = Path(job["input_path"])
+    if not input_path.exists():
+        _update_job(job_id, status="failed", error=f"Input file not found: {input_path}")
+        return
+    pipeline = job.get("pipeline")
+    if pipeline is not None:
+        spec = PipelineSpec.model_validate(pipeline["spec"])
+        job_queue.submit(
+            partial(process_pipeline, job_id, spec, input_path, Path(pipeline["output_dir"]), options, pipeline.get("preset")),
+            force=True, priority=priority, client=client, key=job_id,
+        )
+        return
+    output_path = Path(job["output_path"])
+    if upload is not None:
+        job_queue.submit(
+            partial(process_spooled_upload, job_id, input_path, output_path, job["format"], options),
+            force=True, priority=priority, client=client, key=job_id,
+        )
+        return
+    key = _request_key(input_path, output_path, job["format"], options)
+    execution = executions.get(key)
+    if execution is not None:
+        await _join_execution(execution, job_id, priority)
+        return
+    _start_conversion(job_id, key, input_path, output_path, job["format"], options, priority, client, force=True)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    global _changed, admission, job_queue
+    _changed = asyncio.Event()
+    admission = app.state.admission = AdmissionController.from_env()
+    job_queue = app.state.job_queue = JobQueue.from_env()
+    job_queue.start()
+    lag_probe = asyncio.create_task(metrics.probe_loop_lag())
+    for job in job_store().recover():
+        await _resume_job(job)
+    yield
+    lag_probe.cancel()
+    await job_queue.stop()
+    job_store().flush()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="FluxConverter API")
+    app = FastAPI(title="FluxConverter API", lifespan=_lifespan)
 
     @app.get("/healthz")
     def healthz():
         return {"status": "ok"}
 
+    @app.get("/metrics")
+    def metrics_endpoint():
+        gauges = [
+            ("fluxconverter_queue_depth", "Accepted jobs waiting for a worker.", job_queue.depth),
+            ("fluxconverter_jobs_active", "Jobs held by queue workers.", job_queue.active),
+            ("fluxconverter_jobs_running", "Admitted jobs running ffmpeg.", admission.running),
+            ("fluxconverter_jobs_awaiting_admission", "Jobs waiting for host capacity.", admission.queued),
+            ("fluxconverter_jobs_paused", "Bulk jobs paused for higher-priority work.", admission.paused),
+            ("fluxconverter_cpu_budget", "Cores the admission controller may hand out.", admission.cpu_budget),
+            ("fluxconverter_cpu_budget_used", "Estimated cores held by running jobs.", admission.cpu_used),
+            ("fluxconverter_executions_coalesced", "In-flight executions shared by several jobs.",
+             sum(1 for e in executions.values() if len(e.job_ids) > 1)),
+        ]
+        return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
     @app.post("/run")
-    async def run(req: RunRequest):
+    async def run(req: RunRequest, request: Request):
         # Validate input file exists
         input_path = Path(req.input_path)
         if not input_path.exists():
@@ -46,59 +377,347 @@ def create_app() -> FastAPI:
         # Generate output filename
         output_name = input_path.stem + f".{req.output_format}"
         output_path = output_dir / output_name
+        # Never overwrite the source
+        if output_path.resolve() == input_path.resolve():
+            output_path = output_dir / f"{input_path.stem}_converted.{req.output_format}"
+
+        # Live output: playable while the encode is still running
+        live_mode = req.options.get("live")
+        if live_mode:
+            if live_mode not in LIVE_MODES:
+                raise HTTPException(status_code=400, detail=f"Unknown live mode: {live_mode} (expected one of {', '.join(LIVE_MODES)})")
+            if req.output_format != "mp4":
+                raise HTTPException(status_code=400, detail="Live output requires output_format mp4")
+            output_path = live_output_path(output_path, live_mode)
         
         # Generate job ID
         job_id = str(uuid.uuid4())
+        live_url = None
+        if live_mode == "hls":
+            live_url = f"/jobs/{job_id}/live/{output_path.name}"
+        elif live_mode == "fmp4":
+            live_url = f"/jobs/{job_id}/stream"
         
+        # An identical request is already running: share its execution
+        key = _request_key(input_path, output_path, req.output_format, req.options)
+        execution = executions.get(key)
+        client = _client_id(request, req.client)
+        if execution is not None:
+            primary = job_store()[execution.job_ids[0]]
+            _add_job(job_id, {
+                **primary, "id": job_id, "live_url": live_url, "coalesced_with": primary["id"],
+                "priority": req.priority, "client": client,
+            })
+            await _join_execution(execution, job_id, req.priority)
+            return {"accepted": True, "job_id": job_id, "output_path": str(output_path), "live_url": live_url, "coalesced_with": primary["id"]}
+        _check_queue(client)
+
         # Store job info
-        jobs[job_id] = {
+        _add_job(job_id, {
             "id": job_id,
             "input_path": str(input_path),
             "output_path": str(output_path),
             "format": req.output_format,
+            "options": req.options,
             "status": "queued",
             "progress": 0,
-            "error": None
-        }
-        
-        # Start conversion in background
-        asyncio.create_task(process_conversion(job_id, input_path, output_path, req.output_format, req.options))
+            "error": None,
+            "live_url": live_url,
+            "priority": req.priority,
+            "client": client,
+        })
+        _start_conversion(job_id, key, input_path, output_path, req.output_format, req.options, req.priority, client)
         
-        return {"accepted": True, "job_id": job_id, "output_path": str(output_path)}
+        return {"accepted": True, "job_id": job_id, "output_path": str(output_path), "live_url": live_url}
+
+    @app.post("/upload")
+    async def upload(
+        request: Request,
+        output_dir: str,
+        output_format: str,
+        filename: str = "upload",
+        mode: Literal["auto", "pipe", "spool"] = "auto",
+        priority: Priority = DEFAULT_PRIORITY,
+        client: str | None = None,
+        options: str = "{}",
+    ):
+        """Convert a file sent as the (chunked) request body.
+
+        Streamable containers are piped straight into ffmpeg, which
+        encodes while the upload is still arriving; the upload is
+        throttled to ffmpeg's pace (and waits while the job is queued).
+        Containers that need seeking are spooled to scratch space first.
+        Query parameters stand in for RunRequest's fields, with
+        ``options`` as JSON. The output is named after the upload and the
+        job id. Responds once the body has been consumed.
+        """
+        try:
+            opts = json.loads(options)
+        except ValueError:
+            opts = None
+        if not isinstance(opts, dict):
+            raise HTTPException(status_code=400, detail="options must be a JSON object")
+        if opts.get("live"):
+            raise HTTPException(status_code=400, detail="Live output is not supported for uploads")
+        client_id = _client_id(request, client)
+        _check_queue(client_id)
+
+        name = Path(filename).name or "upload"  # No directories from the client
+        if mode == "auto":
+            mode = "pipe" if is_streamable(name) else "spool"
+        out_dir = Path(output_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        job_id = str(uuid.uuid4())
+        # Named per job: uploads of one filename (or the default) must not share an output
+        output_path = out_dir / f"{Path(name).stem}-{job_id}.{output_format}"
+        input_path = upload_dir() / f"{job_id}{Path(name).suffix}" if mode == "spool" else Path(name)
+        _add_job(job_id, {
+            "id": job_id,
+            "input_path": str(input_path),
+            "output_path": str(output_path),
+            "format": output_format,
+            "options": opts,
+            "status": "queued",
+            "progress": 0,
+            "error": None,
+            "live_url": None,
+            "priority": priority,
+            "client": client_id,
+            "upload": {"filename": name, "mode": mode},
+        })
+
+        if mode == "pipe":
+            length = request.headers.get("content-length", "")
+            pipe = _upload_pipes[job_id] = BodyPipe(expected=int(length) if length.isdigit() else None)
+            job_queue.submit(
+                partial(process_streamed_upload, job_id, pipe, input_path, output_path, output_format, opts),
+                force=True, priority=priority, client=client_id, key=job_id,
+            )
+            try:
+                async for chunk in request.stream():
+                    if chunk and not await pipe.put(chunk):
+                        break  # The job ended; the rest of the body is not needed
+                else:
+                    await pipe.finish()
+            except ClientDisconnect:
+                await pipe.abort("Client disconnected during upload")
+            received = pipe.received
+        else:
+            try:
+                received = await spool(request.stream(), input_path)
+            except ClientDisconnect:
+                _update_job(job_id, status="failed", error="Client disconnected during upload")
+                raise HTTPException(status_code=400, detail="Client disconnected during upload")
+            if job_store()[job_id]["status"] in FINISHED_STATUSES:
+                input_path.unlink(missing_ok=True)  # Cancelled while uploading
+            else:
+                job_queue.submit(
+                    partial(process_spooled_upload, job_id, input_path, output_path, output_format, opts),
+                    force=True, priority=priority, client=client_id, key=job_id,
+                )
+        _update_job(job_id, upload={"filename": name, "mode": mode, "received": received})
+        return {
+            "accepted": True, "job_id": job_id, "output_path": str(output_path),
+            "mode": mode, "received": received, "status": job_store()[job_id]["status"],
+        }
+
+    @app.get("/presets")
+    async def list_presets():
+        return {"presets": preset_registry().names()}
+
+    @app.post("/pipeline")
+    async def run_pipeline(req: PipelineRequest, request: Request):
+        try:
+            if req.preset:
+                spec = preset_registry().spec(req.preset)
+            elif req.spec is not None:
+                spec = PipelineSpec.model_validate(req.spec)
+            elif req.config_path:
+                spec = PipelineSpec.model_validate_yaml(Path(req.config_path).read_text())
+            else:
+                raise HTTPException(status_code=400, detail="One of preset, spec or config_path is required")
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e.args[0]))
+        except (OSError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid pipeline: {e}")
+        client = _client_id(request, req.client)
+        _check_queue(client)
+        source = req.input_path or spec.steps[0].params.get("input")
+        if not source or not Path(source).exists():
+            raise HTTPException(status_code=400, detail=f"Input file not found: {source}")
+        input_path = Path(source)
+        output_dir = Path(req.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        job_id = str(uuid.uuid4())
+        _add_job(job_id, {
+            "id": job_id,
+            "input_path": str(input_path),
+            "output_path": None,
+            "format": "pipeline",
+            "options": req.options,
+            "pipeline": {"spec": spec.model_dump(), "preset": req.preset, "output_dir": str(output_dir)},
+            "status": "queued",
+            "progress": 0,
+            "error": None,
+            "live_url": None,
+            "priority": req.priority,
+            "client": client,
+        })
+        job_queue.submit(
+            partial(process_pipeline, job_id, spec, input_path, output_dir, req.options, req.preset),
+            priority=req.priority, client=client, key=job_id,
+        )
+        return {"accepted": True, "job_id": job_id, "progress_url": f"/jobs/{job_id}/progress"}
+
+    @app.get("/jobs/{job_id}/progress")
+    async def stream_progress(job_id: str):
+        """Stream a job's status as JSON lines, one per change, until it finishes."""
+        if job_id not in job_store():
+            raise HTTPException(status_code=404, detail="Job not found")
+        return StreamingResponse(_progress_lines(job_id), media_type="application/x-ndjson")
+
+    @app.get("/status")
+    async def get_changed(since: int = 0, limit: int = STATUS_PAGE_SIZE):
+        """Jobs changed after version ``since``; pass the returned version next time."""
+        changed, version = job_store().changed_since(since, max(1, min(limit, STATUS_PAGE_SIZE)))
+        return {"version": version, "jobs": changed}
+
+    @app.get("/events")
+    async def job_events(
+        job_id: List[str] | None = Query(None),
+        since: int | None = None,
+        last_event_id: str | None = Header(None),
+    ):
+        """Server-Sent Events with coalesced job updates: given jobs, or all jobs.
+
+        Given jobs start with their current state; the all-jobs stream
+        starts with changes from now on unless ``since`` is given.
+        """
+        if last_event_id and last_event_id.isdigit():
+            since = int(last_event_id)  # Reconnecting EventSource resumes where it left off
+        if since is None:
+            since = 0 if job_id else job_store().current_version()
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        return StreamingResponse(_sse_events(job_id, since), media_type="text/event-stream", headers=headers)
+
+    @app.delete("/jobs/{job_id}")
+    async def cancel_job(job_id: str):
+        """Cancel a queued or running job.
+
+        Its ffmpeg is terminated (then killed if it lingers), its scheduler
+        slot freed and its partial output deleted. A job sharing its
+        conversion with others is only detached; the conversion goes on.
+        Jobs run by another API process must be cancelled through it.
+        """
+        job = job_store().get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job["status"] in FINISHED_STATUSES:
+            raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+        if job_store().owned_elsewhere(job_id):
+            raise HTTPException(status_code=409, detail="Job is run by another API process; cancel it there")
+        execution = _job_execution.get(job_id)
+        if execution is not None and len(execution.job_ids) > 1:
+            execution.job_ids.remove(job_id)
+            if job_id != execution.runner:
+                del _job_execution[job_id]
+        else:
+            await job_queue.cancel(execution.runner if execution is not None else job_id)
+            if execution is not None:
+                _drop_execution(execution)  # Already gone if it was running
+            pipe = _upload_pipes.pop(job_id, None)
+            if pipe is not None:
+                pipe.close()
+            if job.get("upload", {}).get("mode") == "spool":
+                Path(job["input_path"]).unlink(missing_ok=True)
+            status = job_store()[job_id]["status"]
+            if status in FINISHED_STATUSES:
+                return {"cancelled": False, "job_id": job_id, "status": status}
+        job_store().update(job_id, status="cancelled")
+        metrics.jobs_total.inc("cancelled")
+        _notify_changed()
+        return {"cancelled": True, "job_id": job_id, "status": "cancelled"}
 
     @app.get("/status/{job_id}")
     async def get_status(job_id: str):
-        if job_id not in jobs:
+        job = job_store().get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    @app.get("/jobs/{job_id}/stream")
+    async def stream_output(job_id: str):
+        """Stream a fragmented MP4 output while it is being encoded."""
+        if job_id not in job_store():
             raise HTTPException(status_code=404, detail="Job not found")
-        return jobs[job_id]
+        path = Path(job_store()[job_id]["output_path"])
+        return StreamingResponse(_tail_file(job_id, path), media_type=MEDIA_TYPES[".mp4"])
+
+    @app.get("/jobs/{job_id}/live/{name}")
+    async def live_file(job_id: str, name: str):
+        """Serve the HLS playlist and segments of a running or finished job."""
+        if job_id not in job_store():
+            raise HTTPException(status_code=404, detail="Job not found")
+        live_dir = Path(job_store()[job_id]["output_path"]).parent
+        path = live_dir / name
+        if Path(name).name != name or path.suffix not in MEDIA_TYPES:
+            raise HTTPException(status_code=404, detail="Not found")
+        # Hold the first playlist request until ffmpeg has written it
+        waited = 0.0
+        while not path.exists() and not _job_finished(job_id) and waited < LIVE_WAIT_SECONDS:
+            await asyncio.sleep(LIVE_POLL_SECONDS)
+            waited += LIVE_POLL_SECONDS
+        if not path.exists():
+            raise HTTPException(status_code=404, detail="Not available yet")
+        headers = {"Cache-Control": "no-cache"} if path.suffix == ".m3u8" else None
+        return FileResponse(path, media_type=MEDIA_TYPES[path.suffix], headers=headers)
 
     return app
 
 
-async def process_conversion(job_id: str, input_path: Path, output_path: Path, output_format: str, options: dict = None):
+async def process_conversion(job_id: str, input_path: Path, output_path: Path, output_format: str, options: dict = None, stdin: BodyPipe | None = None):
     """Process a conversion job in the background."""
     if options is None:
         options = {}
         
     try:
-        jobs[job_id]["status"] = "processing"
-        
         # Check if this is an image with AI upscaling
-        if output_format in ["png", "jpg", "jpeg", "webp", "bmp", "tiff"] and options.get("ai_upscaling"):
+        if output_format in ["png", "jpg", "jpeg", "webp", "bmp", "tiff"] and options.get("ai_upscaling") and stdin is None:
             await process_ai_upscaling(job_id, input_path, output_path, options)
         else:
             # Regular FFmpeg conversion
-            await process_ffmpeg_conversion(job_id, input_path, output_path, output_format, options)
+            await process_ffmpeg_conversion(job_id, input_path, output_path, output_format, options, stdin)
         
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = str(e)
+        _update_job(job_id, status="failed", error=str(e))
+    finally:
+        execution = _job_execution.get(job_id)
+        if execution is not None:
+            _drop_execution(execution)
+
+
+async def process_streamed_upload(job_id: str, pipe: BodyPipe, input_name: Path, output_path: Path, output_format: str, options: dict):
+    """Convert an upload while it is still arriving."""
+    try:
+        await process_conversion(job_id, input_name, output_path, output_format, options, stdin=pipe)
+    finally:
+        # Finished early (failed or cancelled): stop taking the upload
+        pipe.close()
+        _upload_pipes.pop(job_id, None)
+
+
+async def process_spooled_upload(job_id: str, spool_path: Path, output_path: Path, output_format: str, options: dict):
+    """Convert an upload spooled to scratch space, then drop the spool."""
+    await process_conversion(job_id, spool_path, output_path, output_format, options)
+    # Not on cancellation: a job interrupted by shutdown resumes from its spool
+    spool_path.unlink(missing_ok=True)
 
 
 async def process_ai_upscaling(job_id: str, input_path: Path, output_path: Path, options: dict):
     """Process AI upscaling for images."""
     try:
-        jobs[job_id]["progress"] = 10
+        _update_job(job_id, status="processing", progress=10)
         
         # For now, simulate AI processing (will implement Real-ESRGAN later)
         ai_model = options.get("ai_model", "Real-ESRGAN")
@@ -106,31 +725,68 @@ async def process_ai_upscaling(job_id: str, input_path: Path, output_path: Path,
         
         # Simulate AI processing time
         for i in range(10, 90, 10):
-            jobs[job_id]["progress"] = i
+            _update_job(job_id, progress=i)
             await asyncio.sleep(0.5)  # Simulate processing time
         
         # For now, just copy the file (placeholder for Real-ESRGAN)
         import shutil
         shutil.copy2(input_path, output_path)
         
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["progress"] = 100
+        _update_job(job_id, status="completed", progress=100)
         
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = f"AI upscaling failed: {str(e)}"
+        _update_job(job_id, status="failed", error=f"AI upscaling failed: {str(e)}")
 
 
-async def process_ffmpeg_conversion(job_id: str, input_path: Path, output_path: Path, output_format: str, options: dict):
-    """Process regular FFmpeg conversion."""
+async def process_ffmpeg_conversion(job_id: str, input_path: Path, output_path: Path, output_format: str, options: dict, stdin: BodyPipe | None = None):
+    """Process regular FFmpeg conversion.
+
+    With ``stdin`` the input is an upload streamed into ffmpeg as it
+    arrives; ``input_path`` only names it.
+    """
     # Detect hardware capabilities
     hw_caps = detect_hw_caps()
     
+    # Probe once: duration drives progress, streams that already suit the
+    # target container are copied. A streamed upload can't be probed
+    # ahead of time, so it is always transcoded.
+    info = None
+    if stdin is None:
+        try:
+            info = await probe(str(input_path))
+        except (OSError, RuntimeError, ValueError):
+            info = None  # No usable ffprobe output: transcode everything
+    copy_info = None if options.get("transcode") else info
+    source = "pipe:0" if stdin is not None else str(input_path)
+
     # Choose appropriate codec based on format
+    start_chunked = None
+    live_mode = None
+    key_extra: list[str] = []
     if output_format in ["mp4", "webm"]:
-        vcodec = choose_encoder(hw_caps, prefer_hevc=(output_format == "mp4"))
-        acodec = "aac"
-        cmd = build_cpu_cmd(str(input_path), str(output_path), vcodec=vcodec, acodec=acodec)
+        # Calibrated hosts pick the fastest encoder/preset meeting the job's target
+        video = info.video if info else None
+        target = EncodeTarget.from_options(options, video.width if video else None, video.height if video else None)
+        profile = load_profile() if target else None
+        vcodec = choose_encoder(hw_caps, prefer_hevc=(output_format == "mp4"), profile=profile, target=target)
+        plan = plan_streams(copy_info, output_format, vcodec, "aac")
+        vcodec, acodec, extra = plan.vcodec, plan.acodec, plan.extra
+        if profile and vcodec != "copy":
+            extra = profile.preset_args(vcodec, target) + extra
+        live_mode = options.get("live")
+        if live_mode:
+            extra = extra + live_output_args(output_path, live_mode)
+        cmd = build_cpu_cmd(source, str(output_path), vcodec=vcodec, acodec=acodec, extra=extra)
+        if options.get("chunked") and not live_mode and vcodec != "copy" and stdin is None:
+            # Segment-parallel encode for long sources
+            segment_seconds = int(options.get("segment_seconds", DEFAULT_SEGMENT_SECONDS))
+            start_chunked = partial(
+                run_chunked,
+                str(input_path), str(output_path), vcodec=vcodec, acodec=acodec, extra=extra,
+                segment_seconds=segment_seconds,
+                workers=options.get("chunk_workers"),
+            )
+            key_extra = ["chunked", str(segment_seconds)]
     elif output_format in ["mp3", "wav", "flac", "m4a"]:
         # Audio-only conversion
         acodec_map = {
@@ -139,20 +795,152 @@ async def process_ffmpeg_conversion(job_id: str, input_path: Path, output_path:
             "flac": "flac",
             "m4a": "aac"
         }
-        acodec = acodec_map.get(output_format, "aac")
-        cmd = build_cpu_cmd(str(input_path), str(output_path), vcodec="copy", acodec=acodec)
+        plan = plan_streams(copy_info, output_format, "copy", acodec_map.get(output_format, "aac"))
+        vcodec, acodec = plan.vcodec, plan.acodec
+        cmd = build_cpu_cmd(source, str(output_path), vcodec=vcodec, acodec=acodec)
     else:
         # Image or other formats - use copy for now
-        cmd = build_cpu_cmd(str(input_path), str(output_path), vcodec="copy", acodec="copy")
-    
-    # Run conversion with progress tracking
-    frame_count = 0
-    async for progress in run_ffmpeg(cmd):
-        if progress.frame is not None:
-            frame_count = progress.frame
-            # Simple progress calculation (could be more sophisticated)
-            jobs[job_id]["progress"] = min(90, frame_count)  # Cap at 90% until complete
-    
-    jobs[job_id]["status"] = "completed"
-    jobs[job_id]["progress"] = 100
+        vcodec = acodec = "copy"
+        cmd = build_cpu_cmd(source, str(output_path), vcodec="copy", acodec="copy")
+    _update_job(job_id, codecs={"video": vcodec, "audio": acodec})
 
+    # Identical input + command already converted: reuse that output
+    key = None
+    if options.get("cache", True) and not live_mode and stdin is None:
+        fingerprint = await asyncio.to_thread(input_fingerprint, input_path, bool(options.get("cache_full_hash")))
+        key = command_key(fingerprint, cmd, input_path, output_path, ffmpeg_version(), key_extra)
+        if await asyncio.to_thread(result_cache().fetch, key, output_path):
+            metrics.cache_requests.inc("hit")
+            _update_job(job_id, cache="hit", status="completed", progress=100)
+            return
+        metrics.cache_requests.inc("miss")
+
+    await _run_admitted(job_id, cmd, input_path, [output_path], info, vcodec, options, start_chunked, live_mode, stdin)
+
+    if key is not None:
+        await asyncio.to_thread(result_cache().store, key, output_path)
+        _update_job(job_id, cache="miss")
+
+    _update_job(job_id, status="completed", progress=100, eta_seconds=0)
+
+
+async def _run_admitted(
+    job_id: str,
+    cmd: List[str],
+    input_path: Path,
+    output_paths: List[Path],
+    info: MediaInfo | None,
+    vcodec: str,
+    options: dict,
+    start_chunked=None,
+    live_mode: str | None = None,
+    stdin: BodyPipe | None = None,
+) -> None:
+    """Wait for admission, then run one ffmpeg job on its own cores with progress tracking."""
+    # Outputs are deleted before ffmpeg starts: that must never hit the source
+    if stdin is None and any(path.resolve() == input_path.resolve() for path in output_paths):
+        raise RuntimeError(f"Refusing to overwrite the input file {input_path}")
+    # Stay queued until the host has room for this job's estimated cost
+    # A piped upload has barely started arriving: go by its announced size
+    input_bytes = input_path.stat().st_size if stdin is None else stdin.size_hint
+    cost = estimate_cost(info, vcodec, input_bytes)
+    if start_chunked is not None:
+        # Segment workers are meant to fill the host
+        cost.cpu = float(min(admission.cpu_budget, core_pool.size))
+    _update_job(job_id, cost=cost.as_dict())
+    job = job_store().get(job_id) or {}
+    # A shared execution runs at the highest class of the jobs attached to it
+    execution = _job_execution.get(job_id)
+    priority = execution.priority if execution is not None else job.get("priority", DEFAULT_PRIORITY)
+    control = JobControl()
+    if execution is not None:
+        execution.control = control
+    cores: List[int] = []
+
+    def on_pause(paused: bool) -> None:
+        # A stopped job's cores are free for the job that preempted it
+        if paused:
+            core_pool.release(cores)
+            _update_job(job_id, status="paused")
+        else:
+            core_pool.hold(cores)
+            _update_job(job_id, status="processing", paused_seconds=round(control.total_paused(), 1))
+
+    async with admission.admit(cost, output_paths[0].parent, priority, control, on_pause):
+        if execution is not None and execution.priority != priority:
+            # Promoted before its slot was in line
+            await admission.promote(control, execution.priority)
+        cores[:] = core_pool.acquire(math.ceil(cost.cpu))
+        usage = ResourceUsage(input_bytes=input_bytes)
+        if "created" in job:
+            metrics.queue_wait_seconds.observe(max(0.0, time.time() - job["created"]), priority)
+        writing = False
+        try:
+            _update_job(job_id, status="processing", cores=cores)
+
+            # Never write through a link into a cached result or stale live output
+            for path in output_paths:
+                path.unlink(missing_ok=True)
+            writing = True
+
+            # Run conversion with progress tracking
+            if start_chunked is not None:
+                progress_stream = start_chunked(cores=cores, usage=usage, control=control)
+            else:
+                limits = ResourceLimits(cores=cores, threads=len(cores), memory_bytes=_memory_limit(options))
+                progress_stream = run_ffmpeg(
+                    cmd, limits=limits, usage=usage, control=control, stdin=stdin,
+                    outputs=[str(path) for path in output_paths],
+                )
+            tracker = ProgressTracker(info.duration if info else None)
+            started = time.monotonic()
+            media_seconds = None
+            async for progress in progress_stream:
+                _update_job(job_id, **tracker.update(progress))
+                if progress.out_time_ms is not None:
+                    media_seconds = progress.out_time_ms / 1_000_000
+            wall = time.monotonic() - started - control.total_paused()
+            metrics.record_encode(vcodec, wall, usage.frames, media_seconds)
+        except FfmpegError as e:
+            metrics.ffmpeg_failures.inc(str(e.returncode))
+            raise
+        except asyncio.CancelledError:
+            # Cancelled: ffmpeg has been stopped by now, drop what it left behind
+            if writing:
+                for path in output_paths:
+                    if live_mode == "hls":
+                        shutil.rmtree(path.parent, ignore_errors=True)
+                    else:
+                        path.unlink(missing_ok=True)
+            raise
+        finally:
+            if not control.paused:
+                core_pool.release(cores)
+            usage.output_bytes = sum(_output_bytes(path, live_mode) for path in output_paths)
+            if stdin is not None:
+                usage.input_bytes = stdin.received
+            metrics.input_bytes.inc(amount=usage.input_bytes)
+            metrics.output_bytes.inc(amount=usage.output_bytes)
+            _update_job(job_id, usage=usage.as_dict(), paused_seconds=round(control.total_paused(), 1))
+
+
+async def process_pipeline(job_id: str, spec: PipelineSpec, input_path: Path, output_dir: Path, options: dict, preset: str | None = None):
+    """Run a pipeline spec as one ffmpeg process."""
+    try:
+        if preset:
+            compiled = preset_registry().compile(preset, str(input_path), output_dir)
+        else:
+            compiled = compile_pipeline(spec, str(input_path), output_dir)
+        _update_job(job_id, outputs=compiled.outputs, command=compiled.cmd)
+        try:
+            info = await probe(str(input_path))
+        except (OSError, RuntimeError, ValueError):
+            info = None
+        # The heaviest encoder in the pipeline sizes its admission cost
+        vcodecs = [str(s.params.get("vcodec", "libx264")) for s in spec.encode_steps()]
+        vcodec = max(vcodecs, key=encoder_factor)
+        outputs = [Path(o) for o in compiled.outputs]
+        await _run_admitted(job_id, compiled.cmd, input_path, outputs, info, vcodec, options)
+        _update_job(job_id, status="completed", progress=100, eta_seconds=0)
+    except Exception as e:
+        _update_job(job_id, status="failed", error=str(e))
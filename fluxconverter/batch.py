@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import glob
+import itertools
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Collection, Dict, Iterator, Optional, Set
+
+from .core.affinity import CorePool, ResourceLimits
+from .core.ffmpeg import FfmpegError, FfmpegProgress
+from .runner import run_cpu_transcode
+
+
+# Extensions picked up when a directory is given
+MEDIA_EXTENSIONS = {
+    ".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v", ".mpg", ".mpeg", ".ts", ".mts", ".wmv", ".flv",
+}
+# Seconds between aggregated progress lines
+PROGRESS_INTERVAL = 1.0
+JOURNAL_NAME = "fluxconverter-journal.jsonl"
+
+
+@dataclass
+class BatchItem:
+    input_path: Path
+    output_path: Path
+    # Set for manifest rows that name no usable input; reported as failed
+    error: Optional[str] = None
+
+
+def _output_for(input_path: Path, output_dir: Path, output_format: str, root: Optional[Path]) -> Path:
+    # Keep the source tree layout under output_dir so equal names don't collide
+    rel = input_path.relative_to(root) if root else Path(input_path.name)
+    return (output_dir / rel).with_suffix(f".{output_format}")
+
+
+def _glob_root(pattern: str) -> Path:
+    """The fixed directory part of a glob pattern, before the first wildcard."""
+    parts = Path(pattern).parts
+    fixed = list(itertools.takewhile(lambda p: not glob.has_magic(p), parts[:-1]))
+    return Path(*fixed) if fixed else Path(".")
+
+
+def _manifest_rows(path: Path) -> Iterator[tuple]:
+    """(line number, row, error) per manifest row; row is None when unusable."""
+    with open(path, newline="") as f:
+        if path.suffix.lower() == ".csv":
+            reader = csv.DictReader(f)
+            rows = ((reader.line_num, row) for row in reader)
+        else:
+            rows = ((n, line) for n, line in enumerate(f, 1) if line.strip())
+        for n, row in rows:
+            if isinstance(row, str):
+                try:
+                    row = json.loads(row)
+                except ValueError as e:
+                    yield n, None, f"invalid JSON: {e}"
+                    continue
+            if not isinstance(row, dict) or not isinstance(row.get("input"), str) or not row["input"]:
+                yield n, None, "no input given"
+            else:
+                yield n, row, None
+
+
+def _manifest_root(path: Path) -> Optional[Path]:
+    # A separate pass, so the manifest is still never held in memory
+    root: Optional[str] = None
+    for _, row, _ in _manifest_rows(path):
+        if row is None or row.get("output"):
+            continue
+        parent = os.path.dirname(os.path.abspath(row["input"]))
+        root = parent if root is None else os.path.commonpath([root, parent])
+    return Path(root) if root is not None else None
+
+
+def _raw_items(source: str, output_dir: Path, output_format: str) -> Iterator[BatchItem]:
+    path = Path(source)
+    if path.is_dir():
+        for dirpath, _, files in os.walk(path):
+            for name in sorted(files):
+                p = Path(dirpath) / name
+                if p.suffix.lower() in MEDIA_EXTENSIONS:
+                    yield BatchItem(p, _output_for(p, output_dir, output_format, path))
+    elif path.suffix.lower() in (".csv", ".jsonl") and path.is_file():
+        root = _manifest_root(path)
+        for n, row, error in _manifest_rows(path):
+            if error:
+                where = Path(f"{path}:{n}")
+                yield BatchItem(where, where, error=error)
+                continue
+            p = Path(row["input"])
+            out = row.get("output")
+            yield BatchItem(p, Path(out) if out else _output_for(Path(os.path.abspath(p)), output_dir, output_format, root))
+    else:
+        root = _glob_root(source)
+        for match in sorted(glob.iglob(source, recursive=True)):
+            p = Path(match)
+            if p.is_file():
+                yield BatchItem(p, _output_for(p, output_dir, output_format, root))
+
+
+def iter_items(source: str, output_dir: Path, output_format: str, owned: Collection[str] = ()) -> Iterator[BatchItem]:
+    """Items from a directory (recursive), a CSV/JSONL manifest or a glob pattern.
+
+    Manifest rows name the input in an ``input`` column/key and may give
+    an explicit ``output``. Outputs keep the layout below the source's
+    root. An output that would overwrite an input, an existing file or
+    another item's output gets a numbered name instead. Files in
+    ``owned`` (outputs of earlier runs, see journal_outputs) may be
+    overwritten, and are never taken as inputs.
+    """
+    taken: Set[str] = set()
+    seen: Set[str] = set()
+
+    def clashes(path: Path) -> bool:
+        dst = str(path.resolve())
+        return dst in taken or dst in seen or (dst not in owned and os.path.lexists(dst))
+
+    for item in _raw_items(source, output_dir, output_format):
+        if item.error:
+            yield item
+            continue
+        src = str(item.input_path.resolve())
+        if src in taken or src in owned:
+            continue  # Written by this or an earlier run into the tree being walked
+        seen.add(src)
+        out = item.output_path
+        n = 0
+        while clashes(out):
+            n += 1
+            out = item.output_path.with_name(f"{item.output_path.stem}_{n}{item.output_path.suffix}")
+        taken.add(str(out.resolve()))
+        yield BatchItem(item.input_path, out)
+
+
+def _journal_entries(path: Path) -> Iterator[dict]:
+    if not path.exists():
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # Torn last line after a crash
+
+
+def load_journal(path: Path) -> Set[str]:
+    """Inputs a previous run already converted (resolved paths)."""
+    return {str(Path(entry["input"]).resolve()) for entry in _journal_entries(path) if entry.get("status") == "done"}
+
+
+def journal_outputs(path: Path) -> Set[str]:
+    """Outputs earlier runs wrote, or started writing (resolved paths)."""
+    return {str(Path(entry["output"]).resolve()) for entry in _journal_entries(path) if entry.get("output")}
+
+
+@dataclass
+class BatchStats:
+    total: int = 0
+    skipped: int = 0
+    done: int = 0
+    failed: int = 0
+    started: float = field(default_factory=time.monotonic)
+    # Latest fps per running item
+    fps: Dict[str, float] = field(default_factory=dict)
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        finished = self.done + self.failed
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        return (
+            f"[{finished}/{self.total - self.skipped}] done={self.done} failed={self.failed} "
+            f"skipped={self.skipped} running={len(self.fps)} fps={sum(self.fps.values()):.0f} "
+            f"files/min={rate * 60:.1f}"
+        )
+
+
+async def run_batch(
+    items: Iterator[BatchItem],
+    journal_path: Path,
+    workers: int,
+    scale_filter: Optional[str] = None,
+    prefer_hevc: bool = False,
+    report: Callable[[str], None] = lambda line: print(line, file=sys.stderr),
+) -> BatchStats:
+    """Convert items with a fixed number of workers, journaling each result.
+
+    Inputs recorded as done in the journal are skipped, so rerunning the
+    same command after a crash picks up where it stopped, even from
+    another working directory. Unusable manifest rows count as failed.
+    """
+    finished = load_journal(journal_path)
+    stats = BatchStats()
+    pool = CorePool()
+    threads = max(1, pool.size // workers)
+    journal_path.parent.mkdir(parents=True, exist_ok=True)
+    journal = open(journal_path, "a")
+
+    def record(item: BatchItem, status: str, **fields) -> None:
+        if item.error:
+            # Names the manifest row, e.g. "list.csv:12"
+            entry = {"input": str(item.input_path), "status": status, **fields}
+        else:
+            # Resolved, so a rerun from another directory finds the same keys
+            entry = {
+                "input": str(item.input_path.resolve()), "output": str(item.output_path.resolve()),
+                "status": status, **fields,
+            }
+        journal.write(json.dumps(entry) + "\n")
+        journal.flush()
+
+    async def worker() -> None:
+        for item in items:
+            stats.total += 1
+            if item.error:
+                stats.failed += 1
+                record(item, "failed", error=item.error)
+                continue
+            key = str(item.input_path.resolve())
+            # Outputs without a journal entry may be partial: convert again
+            if key in finished:
+                stats.skipped += 1
+                continue
+            item.output_path.parent.mkdir(parents=True, exist_ok=True)
+            # Claims the output, so a rerun may overwrite a partial one
+            record(item, "started")
+            cores = pool.acquire(threads)
+            stats.fps[key] = 0.0
+
+            def on_progress(prog: FfmpegProgress, key: str = key) -> None:
+                if prog.fps is not None:
+                    stats.fps[key] = prog.fps
+
+            try:
+                usage = await run_cpu_transcode(
+                    item.input_path, item.output_path, scale_filter=scale_filter, prefer_hevc=prefer_hevc,
+                    limits=ResourceLimits(cores=cores, threads=len(cores)), on_progress=on_progress,
+                )
+            except (FfmpegError, OSError) as e:
+                stats.failed += 1
+                if item.output_path.resolve() != item.input_path.resolve():
+                    item.output_path.unlink(missing_ok=True)
+                record(item, "failed", error=str(e).splitlines()[0])
+            else:
+                stats.done += 1
+                record(item, "done", usage=usage.as_dict())
+            finally:
+                pool.release(cores)
+                stats.fps.pop(key, None)
+
+    async def reporter() -> None:
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            report(stats.line())
+
+    # Workers share one iterator, so a 100k-file source is never held in memory
+    ticker = asyncio.create_task(reporter())
+    try:
+        await asyncio.gather(*(worker() for _ in range(workers)))
+    finally:
+        ticker.cancel()
+        journal.close()
+    report(stats.line())
+    return stats
@@ -1,13 +1,17 @@
 import asyncio
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 import typer
 import uvicorn
 import yaml
 
+from .batch import JOURNAL_NAME, iter_items, journal_outputs, run_batch
+from .core.calibrate import CALIBRATION_SECONDS, calibrate as run_calibration
+from .core.chunked import default_workers
 from .core.models import PipelineSpec
-from .runner import run_dry
+from .core.presets import preset_registry, resolve_spec
+from .runner import run_dry, run_pipeline
 from .api import create_app
 from .gui.main import main as gui_main
 
@@ -15,6 +19,18 @@ from .gui.main import main as gui_main
 app = typer.Typer(help="FluxConvert CLI")
 
 
+def _check_config(config: str) -> str:
+    """Report a missing pipeline file or unknown preset as a usage error."""
+    try:
+        resolve_spec(config)
+    except FileNotFoundError as e:
+        raise typer.BadParameter(str(e))
+    except KeyError:
+        names = ", ".join(preset_registry().names()) or "none"
+        raise typer.BadParameter(f"No pipeline file or preset named {config!r} (presets: {names})")
+    return config
+
+
 @app.command()
 def dump_config(config: Path):
     """Print the resolved configuration (YAML)."""
@@ -23,9 +39,61 @@ def dump_config(config: Path):
 
 
 @app.command()
-def dry_run(config: Path, preset: Optional[Path] = None):
+def dry_run(config: str = typer.Argument(..., callback=_check_config), preset: Optional[Path] = None, input: Optional[Path] = None, output_dir: Path = Path(".")):
     """Validate and print execution plan without running."""
-    asyncio.run(run_dry(config, preset))
+    asyncio.run(run_dry(config, preset, input, output_dir))
+
+
+@app.command()
+def run(config: str = typer.Argument(..., callback=_check_config), input: Optional[Path] = None, output_dir: Path = Path(".")):
+    """Run a pipeline (YAML file or preset name) as a single ffmpeg process."""
+    for output in asyncio.run(run_pipeline(config, input, output_dir)):
+        typer.echo(output)
+
+
+@app.command()
+def batch(
+    source: str = typer.Argument(..., help="Directory, glob pattern, or CSV/JSONL manifest with an 'input' column"),
+    output_dir: Path = typer.Argument(...),
+    format: str = typer.Option("mp4", help="Output container for items without an explicit output"),
+    workers: int = typer.Option(default_workers(), help="Conversions run at once"),
+    journal: Optional[Path] = typer.Option(None, help=f"Results journal (default: OUTPUT_DIR/{JOURNAL_NAME})"),
+    scale: Optional[str] = typer.Option(None, help="Video filter, e.g. scale=-2:720"),
+    hevc: bool = False,
+):
+    """Convert many files in parallel; rerunning skips items the journal marks done."""
+    journal_path = journal or output_dir / JOURNAL_NAME
+    items = iter_items(source, output_dir, format, owned=journal_outputs(journal_path))
+    stats = asyncio.run(run_batch(items, journal_path, max(1, workers), scale_filter=scale, prefer_hevc=hevc))
+    if stats.failed:
+        raise typer.Exit(1)
+
+
+@app.command()
+def presets():
+    """List the available pipeline presets."""
+    registry = preset_registry()
+    for name in registry.names():
+        typer.echo(f"{name:<24} {registry.path(name)}")
+
+
+@app.command()
+def calibrate(
+    encoder: Optional[List[str]] = typer.Option(None, help="Encoder to benchmark (repeatable); default: all available"),
+    seconds: int = CALIBRATION_SECONDS,
+):
+    """Benchmark encoders/presets on synthetic sources and save a host profile."""
+    def show(run):
+        typer.echo(
+            f"{run.encoder:<18} {run.preset or '-':<10} {run.width}x{run.height:<5} "
+            f"{run.fps:>8.1f} fps {run.bitrate / 1000:>9.0f} kb/s"
+        )
+
+    profile = asyncio.run(run_calibration(encoders=encoder or None, seconds=seconds, on_result=show))
+    if not profile.results:
+        typer.echo("No usable encoders found", err=True)
+        raise typer.Exit(1)
+    typer.echo(f"Saved host profile to {profile.save()}")
 
 
 @app.command("api")
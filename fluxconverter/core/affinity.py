@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+
+NODE_ROOT = Path("/sys/devices/system/node")
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """Parse a kernel cpulist such as '0-3,8-11'."""
+    cpus: List[int] = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def usable_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def numa_nodes() -> List[List[int]]:
+    """Usable CPUs grouped by NUMA node; a single group without topology info."""
+    allowed = set(usable_cpus())
+    nodes: List[List[int]] = []
+    try:
+        for node in sorted(NODE_ROOT.glob("node[0-9]*"), key=lambda p: int(p.name[4:])):
+            cpus = [c for c in parse_cpulist((node / "cpulist").read_text()) if c in allowed]
+            if cpus:
+                nodes.append(cpus)
+    except (OSError, ValueError):
+        nodes = []
+    return nodes or [sorted(allowed)]
+
+
+@dataclass
+class ResourceLimits:
+    """Per-process limits for one ffmpeg child."""
+    cores: Optional[List[int]] = None
+    threads: Optional[int] = None
+    memory_bytes: Optional[int] = None
+
+    def apply_to(self, cmd: List[str], outputs: Optional[Sequence[str]] = None) -> List[str]:
+        """Add matching thread counts to an ffmpeg command.
+
+        ``outputs`` are the command's output files (default: its last
+        argument). Filter thread options are global, but -threads only
+        applies to the encoders of the output it precedes, so every
+        output gets its own.
+        """
+        if not self.threads:
+            return cmd
+        n = str(self.threads)
+        global_opts = ["-filter_threads", n]
+        if "-filter_complex" in cmd:
+            global_opts += ["-filter_complex_threads", n]
+        targets = set(outputs or ())
+        args: List[str] = []
+        for prev, arg in zip(cmd, cmd[1:]):
+            if arg in targets and prev != "-i":
+                args += ["-threads", n]
+            args.append(arg)
+        if len(args) == len(cmd) - 1:
+            # No named output found: the last argument is one
+            args[-1:-1] = ["-threads", n]
+        return [cmd[0], *global_opts, *args]
+
+    def apply_to_process(self, pid: int) -> None:
+        """Pin a started child, every thread it has so far included, and cap its memory.
+
+        Done from the parent: a preexec hook runs Python between fork and
+        exec, which can deadlock a multi-threaded server.
+        """
+        if self.cores and hasattr(os, "sched_setaffinity"):
+            try:
+                tids = [int(t) for t in os.listdir(f"/proc/{pid}/task")]
+            except OSError:
+                tids = [pid]
+            for tid in tids:
+                try:
+                    os.sched_setaffinity(tid, self.cores)
+                except ProcessLookupError:
+                    pass  # Already exited
+        if self.memory_bytes and resource is not None and hasattr(resource, "prlimit"):
+            # RLIMIT_DATA counts heap and private mappings; RLIMIT_AS would
+            # also count thread stacks reserved but never touched
+            limit = getattr(resource, "RLIMIT_DATA", resource.RLIMIT_AS)
+            try:
+                resource.prlimit(pid, limit, (self.memory_bytes, self.memory_bytes))
+            except ProcessLookupError:
+                pass
+
+
+class CorePool:
+    """Hands out core sets to concurrent jobs, keeping each job on one NUMA node.
+
+    Cores are picked least-used first, so when the host is oversubscribed
+    jobs share cores evenly instead of piling onto the same ones.
+    """
+
+    def __init__(self, nodes: Optional[List[List[int]]] = None):
+        self.nodes = nodes or numa_nodes()
+        self._usage: Dict[int, int] = {c: 0 for node in self.nodes for c in node}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self._usage)
+
+    def acquire(self, count: int) -> List[int]:
+        count = max(1, min(count, self.size))
+        with self._lock:
+            best: Optional[List[int]] = None
+            best_load = None
+            for node in self.nodes:
+                if len(node) < count:
+                    continue
+                picked = sorted(node, key=lambda c: self._usage[c])[:count]
+                load = sum(self._usage[c] for c in picked)
+                if best_load is None or load < best_load:
+                    best, best_load = picked, load
+            if best is None:
+                # Wider than any node: spread across the whole host
+                best = sorted(self._usage, key=lambda c: self._usage[c])[:count]
+            for c in best:
+                self._usage[c] += 1
+            return sorted(best)
+
+    def hold(self, cores: List[int]) -> None:
+        """Count a known core set as in use again (e.g. a resumed job's)."""
+        with self._lock:
+            for c in cores:
+                self._usage[c] += 1
+
+    def release(self, cores: List[int]) -> None:
+        with self._lock:
+            for c in cores:
+                self._usage[c] = max(0, self._usage[c] - 1)
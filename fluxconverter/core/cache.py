@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from .paths import cache_dir
+
+
+# Default size cap for cached outputs (FLUXCONVERTER_RESULT_CACHE_MAX_BYTES overrides)
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+# Sampled fingerprint: this many evenly spaced blocks of SAMPLE_BYTES each
+SAMPLE_BLOCKS = 8
+SAMPLE_BYTES = 1024 * 1024
+_CHUNK = 4 * 1024 * 1024
+
+# linux/fs.h FICLONE
+_FICLONE = 0x40049409
+
+
+def input_fingerprint(path: Path, full: bool = False) -> str:
+    """Hash identifying an input file's content.
+
+    By default only size, mtime and a few sampled blocks are read, which
+    is cheap even for multi-GB sources. ``full=True`` hashes every byte.
+    """
+    st = os.stat(path)
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        if full:
+            h.update(b"full")
+            for chunk in iter(lambda: f.read(_CHUNK), b""):
+                h.update(chunk)
+        else:
+            h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+            step = max(0, st.st_size - SAMPLE_BYTES) // max(1, SAMPLE_BLOCKS - 1)
+            for i in range(SAMPLE_BLOCKS):
+                f.seek(i * step)
+                h.update(f.read(SAMPLE_BYTES))
+    return h.hexdigest()
+
+
+def command_key(fingerprint: str, cmd: List[str], input_path: Path, output_path: Path, ffmpeg_version: str, extra: Iterable[str] = ()) -> str:
+    """Cache key for running ``cmd`` on an input: independent of file locations."""
+    src, dst = str(input_path), str(output_path)
+    # The binary path does not matter, its version does
+    normalized = [ffmpeg_version] + [
+        "{input}" if arg == src else "{output}" + output_path.suffix if arg == dst else arg
+        for arg in cmd[1:]
+    ]
+    h = hashlib.sha256(fingerprint.encode())
+    for part in [*normalized, *extra]:
+        h.update(b"\0" + part.encode())
+    return h.hexdigest()
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        return True
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def _materialize(src: Path, dst: Path) -> str:
+    """Make dst a copy of src as cheaply as possible; returns the method used.
+
+    Never a hardlink: a later writer truncating either file in place
+    (ffmpeg -y does) would corrupt the other. Reflinks are copy-on-write.
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.unlink(missing_ok=True)
+    if _reflink(src, dst):
+        return "reflink"
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+class ResultCache:
+    """Conversion outputs stored by command key, evicted least recently used first."""
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(root / "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, name TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+
+    def _object_path(self, key: str, name: str) -> Path:
+        return self.root / key[:2] / name
+
+    def fetch(self, key: str, dest: Path) -> Optional[str]:
+        """Place a cached result at dest; returns the method used or None on a miss."""
+        with self._lock:
+            row = self._db.execute("SELECT name FROM results WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            obj = self._object_path(key, row[0])
+            if not obj.exists():
+                with self._db:
+                    self._db.execute("DELETE FROM results WHERE key=?", (key,))
+                return None
+            with self._db:
+                self._db.execute("UPDATE results SET last_used=? WHERE key=?", (time.time(), key))
+        try:
+            return _materialize(obj, dest)
+        except FileNotFoundError:
+            return None  # Evicted concurrently
+
+    def store(self, key: str, src: Path) -> None:
+        name = key + src.suffix
+        obj = self._object_path(key, name)
+        _materialize(src, obj)
+        size = obj.stat().st_size
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, name, size, time.time()))
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, name, size in self._db.execute("SELECT key, name, size FROM results ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._object_path(key, name).unlink(missing_ok=True)
+            self._db.execute("DELETE FROM results WHERE key=?", (key,))
+            total -= size
+
+
+_result_cache: Optional[ResultCache] = None
+
+
+def result_cache() -> ResultCache:
+    global _result_cache
+    if _result_cache is None:
+        max_bytes = int(os.environ.get("FLUXCONVERTER_RESULT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        _result_cache = ResultCache(cache_dir() / "results", max_bytes)
+    return _result_cache
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .ffmpeg import FfmpegError, run_ffmpeg
+from .hw import HwCaps, _get_ffmpeg_path, detect_hw_caps, ffmpeg_identity
+from .paths import cache_dir
+
+
+# Encoders benchmarked when present, and the presets tried for each
+# (None = the encoder's defaults)
+CALIBRATION_PRESETS: Dict[str, List[Optional[str]]] = {
+    "libx264": ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium"],
+    "libx265": ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium"],
+    "h264_nvenc": ["p1", "p4", "p7"],
+    "hevc_nvenc": ["p1", "p4", "p7"],
+    "h264_qsv": ["veryfast", "medium", "veryslow"],
+    "hevc_qsv": ["veryfast", "medium", "veryslow"],
+    "h264_videotoolbox": [None],
+    "hevc_videotoolbox": [None],
+}
+# Synthetic source sizes; fps at other sizes is scaled by pixel count
+CALIBRATION_SIZES: Tuple[Tuple[int, int], ...] = ((640, 360), (1280, 720), (1920, 1080))
+CALIBRATION_SECONDS = 4
+CALIBRATION_RATE = 30
+
+
+def codec_family(encoder: str) -> str:
+    return "hevc" if encoder.startswith("hevc") or encoder == "libx265" else "h264"
+
+
+@dataclass
+class Calibration:
+    """One measured encoder/preset/size combination."""
+    encoder: str
+    preset: Optional[str]
+    width: int
+    height: int
+    fps: float
+    bitrate: int  # bits per second at CALIBRATION_RATE
+
+    @property
+    def bits_per_pixel(self) -> float:
+        return self.bitrate / (self.width * self.height * CALIBRATION_RATE)
+
+    @property
+    def args(self) -> List[str]:
+        return ["-preset", self.preset] if self.preset else []
+
+    def fps_at(self, width: int, height: int) -> float:
+        return self.fps * (self.width * self.height) / max(1, width * height)
+
+
+@dataclass
+class EncodeTarget:
+    """What a job needs from its encoder: speed and/or output size."""
+    min_fps: Optional[float] = None
+    max_bits_per_pixel: Optional[float] = None
+    width: int = 1920
+    height: int = 1080
+
+    @classmethod
+    def from_options(cls, options: dict, width: Optional[int] = None, height: Optional[int] = None) -> Optional["EncodeTarget"]:
+        """Target from job options, or None if the job sets neither limit."""
+        min_fps = options.get("min_fps")
+        max_bpp = options.get("max_bits_per_pixel")
+        if min_fps is None and max_bpp is None:
+            return None
+        return cls(
+            min_fps=float(min_fps) if min_fps is not None else None,
+            max_bits_per_pixel=float(max_bpp) if max_bpp is not None else None,
+            width=width or 1920,
+            height=height or 1080,
+        )
+
+
+@dataclass
+class HostProfile:
+    """Calibration results for one host and ffmpeg binary."""
+    ffmpeg: List = field(default_factory=list)  # ffmpeg_identity() at calibration time
+    created: float = 0.0
+    results: List[Calibration] = field(default_factory=list)
+
+    def _nearest(self, encoder: str, preset: Optional[str], width: int, height: int) -> Calibration:
+        runs = [r for r in self.results if r.encoder == encoder and r.preset == preset]
+        pixels = width * height
+        return min(runs, key=lambda r: abs(r.width * r.height - pixels))
+
+    def candidates(self, target: EncodeTarget, encoders: Optional[Iterable[str]] = None) -> List[Calibration]:
+        """Encoder/preset pairs meeting the target, fastest first."""
+        allowed = set(encoders) if encoders is not None else None
+        picks: List[Tuple[float, Calibration]] = []
+        for encoder, preset in dict.fromkeys((r.encoder, r.preset) for r in self.results):
+            if allowed is not None and encoder not in allowed:
+                continue
+            run = self._nearest(encoder, preset, target.width, target.height)
+            fps = run.fps_at(target.width, target.height)
+            if target.min_fps is not None and fps < target.min_fps:
+                continue
+            if target.max_bits_per_pixel is not None and run.bits_per_pixel > target.max_bits_per_pixel:
+                continue
+            picks.append((fps, run))
+        picks.sort(key=lambda p: p[0], reverse=True)
+        return [run for _, run in picks]
+
+    def pick(self, hwc: HwCaps, prefer_hevc: bool, target: EncodeTarget) -> Optional[Calibration]:
+        family = "hevc" if prefer_hevc else "h264"
+        encoders = [e for e in hwc.encoders if codec_family(e) == family]
+        found = self.candidates(target, encoders)
+        return found[0] if found else None
+
+    def preset_args(self, encoder: str, target: EncodeTarget) -> List[str]:
+        found = self.candidates(target, [encoder])
+        return found[0].args if found else []
+
+    def save(self, path: Optional[Path] = None) -> Path:
+        path = path or profile_path()
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(self), indent=2))
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HostProfile":
+        return cls(
+            ffmpeg=list(data.get("ffmpeg", [])),
+            created=data.get("created", 0.0),
+            results=[Calibration(**r) for r in data.get("results", [])],
+        )
+
+
+def profile_path() -> Path:
+    return cache_dir() / "host_profile.json"
+
+
+@lru_cache(maxsize=4)
+def _read_profile(path: str, mtime_ns: int) -> Optional[HostProfile]:
+    try:
+        return HostProfile.from_dict(json.loads(Path(path).read_text()))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def load_profile() -> Optional[HostProfile]:
+    """The saved host profile, or None if missing or made with another ffmpeg."""
+    path = profile_path()
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    profile = _read_profile(str(path), mtime)
+    if profile is None or tuple(profile.ffmpeg) != ffmpeg_identity():
+        return None
+    return profile
+
+
+def build_calibration_cmd(encoder: str, preset: Optional[str], width: int, height: int, seconds: int, output_path: str) -> List[str]:
+    src = f"testsrc2=size={width}x{height}:rate={CALIBRATION_RATE}:duration={seconds}"
+    cmd = [
+        _get_ffmpeg_path(), "-y",
+        "-hide_banner", "-nostdin", "-nostats",
+        "-progress", "pipe:1",
+        "-f", "lavfi", "-i", src,
+        "-c:v", encoder,
+    ]
+    if preset:
+        cmd += ["-preset", preset]
+    cmd += ["-pix_fmt", "yuv420p", "-an", output_path]
+    return cmd
+
+
+async def calibrate(
+    encoders: Optional[Sequence[str]] = None,
+    sizes: Sequence[Tuple[int, int]] = CALIBRATION_SIZES,
+    seconds: int = CALIBRATION_SECONDS,
+    on_result: Optional[Callable[[Calibration], None]] = None,
+) -> HostProfile:
+    """Encode synthetic sources with every available encoder and preset.
+
+    Encoders that ffmpeg lists but cannot open (e.g. NVENC without a GPU)
+    fail on their first run and are skipped.
+    """
+    available = detect_hw_caps().encoders
+    names = [e for e in (encoders or CALIBRATION_PRESETS) if e in available]
+    profile = HostProfile(ffmpeg=list(ffmpeg_identity()), created=time.time())
+    with tempfile.TemporaryDirectory(prefix="fluxconverter-calibrate-") as tmp:
+        out = Path(tmp) / "calibrate.mkv"
+        for encoder in names:
+            runs = [(p, w, h) for p in CALIBRATION_PRESETS.get(encoder, [None]) for w, h in sizes]
+            for preset, width, height in runs:
+                cmd = build_calibration_cmd(encoder, preset, width, height, seconds, str(out))
+                start = time.monotonic()
+                frames = 0
+                try:
+                    async for prog in run_ffmpeg(cmd):
+                        frames = prog.frame or frames
+                except FfmpegError:
+                    break  # Encoder unusable on this host
+                wall = time.monotonic() - start
+                run = Calibration(
+                    encoder=encoder, preset=preset, width=width, height=height,
+                    fps=round(frames / wall, 2) if wall > 0 else 0.0,
+                    bitrate=int(out.stat().st_size * 8 / seconds),
+                )
+                profile.results.append(run)
+                if on_result:
+                    on_result(run)
+    return profile
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Union
+
+from .affinity import ResourceLimits
+from .control import JobControl
+from .ffmpeg import FfmpegProgress, build_cpu_cmd, run_ffmpeg
+from .usage import ResourceUsage
+from .hw import _get_ffmpeg_path
+
+
+DEFAULT_SEGMENT_SECONDS = 60
+
+_DONE = object()
+
+
+def default_workers() -> int:
+    # x264/x265 scale well up to a handful of threads per process
+    return max(1, (os.cpu_count() or 1) // 4)
+
+
+def build_split_cmd(input_path: str, work_dir: str, segment_seconds: int = DEFAULT_SEGMENT_SECONDS) -> List[str]:
+    """Split the first video stream into keyframe-aligned segments without re-encoding."""
+    return [
+        _get_ffmpeg_path(), "-y",
+        "-hide_banner", "-nostdin", "-nostats",
+        "-progress", "pipe:1",
+        "-i", input_path,
+        "-map", "0:v:0", "-an", "-sn", "-dn",
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_time", str(segment_seconds),
+        "-reset_timestamps", "1",
+        os.path.join(work_dir, "seg_%05d.mkv"),
+    ]
+
+
+def build_concat_cmd(list_path: str, audio_source: str, output_path: str, acodec: str = "aac") -> List[str]:
+    """Join encoded segments with the concat demuxer and mux audio from the source."""
+    return [
+        _get_ffmpeg_path(), "-y",
+        "-hide_banner", "-nostdin", "-nostats",
+        "-progress", "pipe:1",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-i", audio_source,
+        "-map", "0:v:0", "-map", "1:a?",
+        "-map_metadata", "1",
+        "-c:v", "copy", "-c:a", acodec,
+        output_path,
+    ]
+
+
+def _speed(val: Optional[str]) -> float:
+    if not val:
+        return 0.0
+    try:
+        return float(val.rstrip("x"))
+    except ValueError:
+        return 0.0
+
+
+def _merge(ticks: List[FfmpegProgress], done: bool = False) -> FfmpegProgress:
+    """Combine per-segment snapshots into one stream-wide snapshot."""
+    running = [t for t in ticks if not t.done]
+    return FfmpegProgress(
+        frame=sum(t.frame or 0 for t in ticks),
+        fps=round(sum((t.fps or 0.0 for t in running), 0.0), 2),
+        speed=f"{sum(_speed(t.speed) for t in running):.2f}x",
+        out_time_ms=sum(t.out_time_ms or 0 for t in ticks),
+        total_size=sum(t.total_size or 0 for t in ticks),
+        dup_frames=sum(t.dup_frames or 0 for t in ticks),
+        drop_frames=sum(t.drop_frames or 0 for t in ticks),
+        done=done,
+    )
+
+
+async def run_chunked(
+    input_path: str,
+    output_path: str,
+    vfilter: Optional[str] = None,
+    vcodec: str = "libx264",
+    acodec: str = "aac",
+    extra: Optional[List[str]] = None,
+    segment_seconds: int = DEFAULT_SEGMENT_SECONDS,
+    workers: Optional[int] = None,
+    cores: Optional[List[int]] = None,
+    usage: Optional[ResourceUsage] = None,
+    control: Optional[JobControl] = None,
+) -> AsyncIterator[FfmpegProgress]:
+    """Encode a video as keyframe-aligned segments in parallel, then concat.
+
+    Video is split with stream copy, each segment is encoded by its own
+    ffmpeg process (at most ``workers`` at a time) and the results are
+    joined with the concat demuxer. Audio is encoded once from the source
+    in the final mux so there are no gaps at segment boundaries. Only
+    per-frame filters are safe in ``vfilter``, since each segment is
+    filtered independently. With ``cores`` every worker is pinned to its
+    own slice of that core set. ``usage`` accumulates the cost of every
+    ffmpeg process involved, and ``control`` holds every running one.
+    """
+    workers = max(1, workers or default_workers())
+    if cores:
+        workers = min(workers, len(cores))
+        slots = [ResourceLimits(cores=cores[i::workers], threads=len(cores[i::workers])) for i in range(workers)]
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        slots = [ResourceLimits(threads=threads) for _ in range(workers)]
+    out = Path(output_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    started = time.monotonic()
+    parts: List[ResourceUsage] = []
+
+    def part() -> Optional[ResourceUsage]:
+        if usage is None:
+            return None
+        parts.append(ResourceUsage())
+        return parts[-1]
+
+    # Keep scratch space on the output filesystem so segments never cross devices
+    with tempfile.TemporaryDirectory(prefix=".chunks-", dir=out.parent) as tmp:
+        async for _ in run_ffmpeg(build_split_cmd(input_path, tmp, segment_seconds), usage=part(), control=control):
+            pass
+        segments = sorted(Path(tmp).glob("seg_*.mkv"))
+        if not segments:
+            raise RuntimeError(f"No video stream to encode in {input_path}")
+
+        encoded = [seg.with_name("enc" + seg.name[3:]) for seg in segments]
+        ticks = [FfmpegProgress() for _ in segments]
+        updates: asyncio.Queue[Union[int, object, Exception]] = asyncio.Queue()
+        # Free worker slots; taking one bounds concurrency and picks its cores
+        free_slots: asyncio.Queue[ResourceLimits] = asyncio.Queue()
+        for slot in slots:
+            free_slots.put_nowait(slot)
+
+        async def encode(i: int) -> None:
+            cmd = build_cpu_cmd(
+                str(segments[i]), str(encoded[i]),
+                vfilter=vfilter, vcodec=vcodec, acodec="copy",
+                extra=["-an", *(extra or [])],
+            )
+            chunk_usage = part()
+            try:
+                slot = await free_slots.get()
+                try:
+                    async for prog in run_ffmpeg(cmd, limits=slot, usage=chunk_usage, control=control):
+                        ticks[i] = prog
+                        updates.put_nowait(i)
+                finally:
+                    free_slots.put_nowait(slot)
+                updates.put_nowait(_DONE)
+            except Exception as e:
+                updates.put_nowait(e)
+
+        tasks = [asyncio.create_task(encode(i)) for i in range(len(segments))]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                item = await updates.get()
+                if isinstance(item, Exception):
+                    raise item
+                if item is _DONE:
+                    remaining -= 1
+                    continue
+                yield _merge(ticks)
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        list_path = Path(tmp) / "concat.txt"
+        list_path.write_text("".join(f"file '{p.name}'\n" for p in encoded))
+        async for _ in run_ffmpeg(build_concat_cmd(str(list_path), input_path, str(out), acodec=acodec), usage=part(), control=control):
+            pass
+        if usage is not None:
+            # Frames come from the segment encodes, not the copy-only split/concat
+            for p in parts:
+                usage.add(p)
+            usage.frames = sum(t.frame or 0 for t in ticks)
+            usage.finish(time.monotonic() - started)
+        yield _merge(ticks, done=True)
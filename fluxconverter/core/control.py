@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+import signal
+import time
+from typing import Optional, Set
+
+
+# Job-control signals; absent on Windows, where jobs can't be paused
+_STOP = getattr(signal, "SIGSTOP", None)
+_CONT = getattr(signal, "SIGCONT", None)
+CAN_PAUSE = _STOP is not None
+
+# Seconds a child gets to exit after SIGTERM before it is killed
+STOP_TIMEOUT = 5.0
+
+
+class JobControl:
+    """The ffmpeg children of one job, so they can be paused and resumed together.
+
+    run_ffmpeg attaches each child it starts. A child started while the
+    job is paused is stopped straight away, so a chunked encode can't
+    slip a new segment in.
+    """
+
+    def __init__(self) -> None:
+        self.processes: Set[asyncio.subprocess.Process] = set()
+        self.paused_seconds = 0.0
+        self._paused_at: Optional[float] = None
+
+    @property
+    def paused(self) -> bool:
+        return self._paused_at is not None
+
+    def total_paused(self) -> float:
+        """Seconds spent paused so far, including the current pause."""
+        current = time.monotonic() - self._paused_at if self._paused_at is not None else 0.0
+        return self.paused_seconds + current
+
+    def attach(self, process: asyncio.subprocess.Process) -> None:
+        self.processes.add(process)
+        if self.paused:
+            _signal(process, _STOP)
+
+    def detach(self, process: asyncio.subprocess.Process) -> None:
+        self.processes.discard(process)
+
+    def pause(self) -> None:
+        if self.paused:
+            return
+        self._paused_at = time.monotonic()
+        for process in self.processes:
+            _signal(process, _STOP)
+
+    def resume(self) -> None:
+        if not self.paused:
+            return
+        for process in self.processes:
+            _signal(process, _CONT)
+        self.paused_seconds = self.total_paused()
+        self._paused_at = None
+
+
+async def stop_process(process: asyncio.subprocess.Process, timeout: float = STOP_TIMEOUT) -> None:
+    """Terminate a child, killing it if it hasn't exited within ``timeout``, and reap it."""
+    if process.returncode is None:
+        try:
+            process.terminate()
+        except ProcessLookupError:
+            pass
+        # A stopped process only acts on SIGTERM once continued
+        _signal(process, _CONT)
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+            return
+        except asyncio.TimeoutError:
+            pass
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+
+def _signal(process: asyncio.subprocess.Process, sig: Optional[int]) -> None:
+    if sig is None or process.returncode is not None:
+        return
+    try:
+        process.send_signal(sig)
+    except ProcessLookupError:
+        pass
@@ -1,9 +1,21 @@
 from __future__ import annotations
 
 import asyncio
-import shlex
+import time
+from collections import deque
 from dataclasses import dataclass
-from typing import AsyncIterator, List, Optional
+from typing import TYPE_CHECKING, AsyncIterable, AsyncIterator, Deque, Dict, List, Optional
+
+from .control import stop_process
+from .usage import ResourceUsage, sample_process
+
+if TYPE_CHECKING:
+    from .affinity import ResourceLimits
+    from .control import JobControl
+
+
+# Number of stderr log lines kept for error reports
+LOG_TAIL_LINES = 50
 
 
 @dataclass
@@ -13,6 +25,22 @@ class FfmpegProgress:
     bitrate: Optional[str] = None
     speed: Optional[str] = None
     out_time_ms: Optional[int] = None
+    total_size: Optional[int] = None
+    dup_frames: Optional[int] = None
+    drop_frames: Optional[int] = None
+    done: bool = False
+
+
+class FfmpegError(RuntimeError):
+    """ffmpeg exited with a non-zero status."""
+
+    def __init__(self, returncode: int, log_tail: List[str]):
+        self.returncode = returncode
+        self.log_tail = log_tail
+        msg = f"ffmpeg failed: {returncode}"
+        if log_tail:
+            msg += "\n" + "\n".join(log_tail)
+        super().__init__(msg)
 
 
 def build_cpu_cmd(input_path: str, output_path: str, vfilter: Optional[str] = None, vcodec: str = "libx264", acodec: str = "aac", extra: Optional[List[str]] = None) -> List[str]:
@@ -20,8 +48,8 @@ def build_cpu_cmd(input_path: str, output_path: str, vfilter: Optional[str] = No
     ffmpeg_path = _get_ffmpeg_path()
     cmd = [
         ffmpeg_path, "-y",
-        "-hide_banner", "-nostdin",
-        "-progress", "pipe:2",
+        "-hide_banner", "-nostdin", "-nostats",
+        "-progress", "pipe:1",
         "-i", input_path,
     ]
     if vfilter:
@@ -33,40 +61,129 @@ def build_cpu_cmd(input_path: str, output_path: str, vfilter: Optional[str] = No
     return cmd
 
 
-async def run_ffmpeg(cmd: List[str]) -> AsyncIterator[FfmpegProgress]:
+def _to_int(val: str) -> Optional[int]:
+    try:
+        return int(val)
+    except ValueError:
+        return None
+
+
+def _to_float(val: str) -> Optional[float]:
+    try:
+        return float(val)
+    except ValueError:
+        return None
+
+
+def _snapshot(fields: Dict[str, str]) -> FfmpegProgress:
+    """Build one progress snapshot from the fields of a -progress block."""
+    # out_time_us is the accurate field; out_time_ms is also in microseconds
+    # in every ffmpeg release, prefer whichever is present.
+    out_time = fields.get("out_time_us", fields.get("out_time_ms"))
+    return FfmpegProgress(
+        frame=_to_int(fields["frame"]) if "frame" in fields else None,
+        fps=_to_float(fields["fps"]) if "fps" in fields else None,
+        bitrate=fields.get("bitrate"),
+        speed=fields.get("speed"),
+        out_time_ms=_to_int(out_time) if out_time is not None else None,
+        total_size=_to_int(fields["total_size"]) if "total_size" in fields else None,
+        dup_frames=_to_int(fields["dup_frames"]) if "dup_frames" in fields else None,
+        drop_frames=_to_int(fields["drop_frames"]) if "drop_frames" in fields else None,
+        done=fields.get("progress") == "end",
+    )
+
+
+async def _drain_log(stream: asyncio.StreamReader, tail: Deque[str]) -> None:
+    async for raw in stream:
+        line = raw.decode("utf-8", errors="ignore").rstrip()
+        if line:
+            tail.append(line)
+
+
+async def _feed_stdin(process: asyncio.subprocess.Process, chunks: AsyncIterable[bytes]) -> None:
+    assert process.stdin is not None
+    try:
+        async for chunk in chunks:
+            process.stdin.write(chunk)
+            # Waits while the pipe is full, so input is never read ahead of ffmpeg
+            await process.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # ffmpeg stopped reading; its exit status says why
+    finally:
+        process.stdin.close()
+
+
+async def run_ffmpeg(
+    cmd: List[str],
+    log_lines: int = LOG_TAIL_LINES,
+    limits: Optional["ResourceLimits"] = None,
+    usage: Optional[ResourceUsage] = None,
+    control: Optional["JobControl"] = None,
+    stdin: Optional[AsyncIterable[bytes]] = None,
+    outputs: Optional[List[str]] = None,
+) -> AsyncIterator[FfmpegProgress]:
+    """Run ffmpeg and yield one FfmpegProgress per -progress tick.
+
+    Expects the command to write -progress to stdout (pipe:1) as
+    build_cpu_cmd does; stderr is drained into a bounded ring buffer
+    whose contents are attached to FfmpegError on failure. ``limits``
+    pins the child to a core set with a matching thread count and an
+    optional memory rlimit. ``usage`` is filled in with the child's CPU,
+    memory, I/O, frame count and wall time. ``control`` holds the child
+    while it runs, so the job can be paused. ``stdin`` is streamed into
+    the child as it is read, for commands reading ``-i pipe:0``.
+    ``outputs`` names the output files of a multi-output command, so
+    each one's encoders get the thread limit.
+    """
+    if limits is not None:
+        cmd = limits.apply_to(cmd, outputs)
+    started = time.monotonic()
     process = await asyncio.create_subprocess_exec(
         *cmd,
+        stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
     )
-    assert process.stderr is not None
-    async for raw in process.stderr:
-        line = raw.decode("utf-8", errors="ignore").strip()
-        if not line or "=" not in line:
-            continue
-        key, val = line.split("=", 1)
-        prog = FfmpegProgress()
-        if key == "frame":
-            try:
-                prog.frame = int(val)
-            except ValueError:
-                pass
-        elif key == "fps":
-            try:
-                prog.fps = float(val)
-            except ValueError:
-                pass
-        elif key == "bitrate":
-            prog.bitrate = val
-        elif key == "speed":
-            prog.speed = val
-        elif key == "out_time_ms":
-            try:
-                prog.out_time_ms = int(val)
-            except ValueError:
-                pass
-        yield prog
-    await process.wait()
+    assert process.stdout is not None and process.stderr is not None
+    if limits is not None:
+        limits.apply_to_process(process.pid)
+    if control is not None:
+        control.attach(process)
+    tail: Deque[str] = deque(maxlen=log_lines)
+    log_task = asyncio.create_task(_drain_log(process.stderr, tail))
+    feed_task = asyncio.create_task(_feed_stdin(process, stdin)) if stdin is not None else None
+    fields: Dict[str, str] = {}
+    try:
+        async for raw in process.stdout:
+            line = raw.decode("utf-8", errors="ignore").strip()
+            if not line or "=" not in line:
+                continue
+            key, val = line.split("=", 1)
+            fields[key] = val.strip()
+            if key == "progress":
+                snap = _snapshot(fields)
+                if usage is not None:
+                    sample_process(process.pid, usage)
+                    usage.frames = snap.frame or usage.frames
+                yield snap
+                fields = {}
+        await log_task
+        await process.wait()
+        if feed_task is not None:
+            # An input that broke off fails the run even if ffmpeg exited cleanly
+            await feed_task
+    finally:
+        if feed_task is not None and not feed_task.done():
+            feed_task.cancel()
+        if process.returncode is None:
+            # Abandoned or cancelled: give ffmpeg a moment to exit cleanly
+            await stop_process(process)
+        if control is not None:
+            control.detach(process)
+        if not log_task.done():
+            log_task.cancel()
+        if usage is not None:
+            usage.finish(time.monotonic() - started)
     if process.returncode != 0:
-        raise RuntimeError(f"ffmpeg failed: {process.returncode}")
+        raise FfmpegError(process.returncode, list(tail))
 
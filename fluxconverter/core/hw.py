@@ -1,8 +1,18 @@
 from __future__ import annotations
 
+import json
+import os
+import shutil
 import subprocess
+import tempfile
+import threading
 from dataclasses import dataclass
-from typing import List
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, FrozenSet, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .calibrate import EncodeTarget, HostProfile
 
 
 @dataclass(frozen=True)
@@ -10,27 +20,37 @@ class HwCaps:
     has_nv: bool
     has_qsv: bool
     has_vtb: bool
-    encoders: List[str]
+    encoders: FrozenSet[str]
+    version: str = "unknown"
 
 
+@lru_cache(maxsize=None)
 def _get_ffmpeg_path() -> str:
     """Get FFmpeg path - bundled first, then system PATH."""
-    import os
-    from pathlib import Path
-    
     # Try bundled FFmpeg first
     bundle_dir = Path(__file__).parent.parent / "bin"
     if os.name == 'nt':  # Windows
         bundled_ffmpeg = bundle_dir / "ffmpeg.exe"
     else:  # Linux/macOS
         bundled_ffmpeg = bundle_dir / "ffmpeg"
-    
+
     if bundled_ffmpeg.exists():
         return str(bundled_ffmpeg)
-    
+
     # Fallback to system PATH
     return "ffmpeg"
 
+
+def _get_ffprobe_path() -> str:
+    """Get ffprobe path - next to the bundled ffmpeg first, then system PATH."""
+    ffmpeg_path = Path(_get_ffmpeg_path())
+    if ffmpeg_path.parent != Path("."):
+        bundled = ffmpeg_path.with_name(ffmpeg_path.name.replace("ffmpeg", "ffprobe"))
+        if bundled.exists():
+            return str(bundled)
+    return "ffprobe"
+
+
 def _run_ffmpeg(args: list[str]) -> str:
     try:
         ffmpeg_path = _get_ffmpeg_path()
@@ -40,18 +60,133 @@ def _run_ffmpeg(args: list[str]) -> str:
         return ""
 
 
-def detect_hw_caps() -> HwCaps:
+def ffmpeg_identity() -> Tuple[str, int, int]:
+    """(resolved path, size, mtime) of the ffmpeg binary in use."""
+    path = _get_ffmpeg_path()
+    resolved = shutil.which(path) or path
+    try:
+        st = os.stat(resolved)
+        return (str(Path(resolved).resolve()), st.st_size, st.st_mtime_ns)
+    except OSError:
+        return (resolved, 0, 0)
+
+
+def _caps_file() -> Path:
+    from .paths import cache_dir
+    return cache_dir() / "hwcaps.json"
+
+
+def _probe_caps() -> HwCaps:
     hw_list = _run_ffmpeg(["-hide_banner", "-hwaccels"]).lower()
     encs = _run_ffmpeg(["-hide_banner", "-encoders"]).lower()
+    version = _run_ffmpeg(["-version"]).splitlines()
     return HwCaps(
         has_nv=("cuda" in hw_list or "nvdec" in hw_list),
         has_qsv=("qsv" in hw_list),
         has_vtb=("videotoolbox" in hw_list),
-        encoders=[line.split()[1] for line in encs.splitlines() if line.strip().startswith("V.") and len(line.split()) > 1],
+        # Output is lowercased above, so video encoder lines start with "v."
+        encoders=frozenset(line.split()[1] for line in encs.splitlines() if line.strip().startswith("v.") and len(line.split()) > 1),
+        version=version[0].strip() if version else "unknown",
     )
 
 
-def choose_encoder(hwc: HwCaps, prefer_hevc: bool = False) -> str:
+_caps_lock = threading.Lock()
+
+
+def _load_caps(identity: Tuple[str, int, int]) -> HwCaps:
+    key = json.dumps(identity)
+    with _caps_lock:
+        try:
+            path: Optional[Path] = _caps_file()
+        except OSError:
+            path = None  # No usable cache directory: probe every process
+        stored: dict = {}
+        if path is not None:
+            try:
+                stored = json.loads(path.read_text())
+            except (OSError, ValueError):
+                stored = {}
+        entry = stored.get(key)
+        if entry is not None:
+            return HwCaps(
+                has_nv=entry["has_nv"], has_qsv=entry["has_qsv"], has_vtb=entry["has_vtb"],
+                encoders=frozenset(entry["encoders"]), version=entry.get("version", "unknown"),
+            )
+        caps = _probe_caps()
+        # Don't persist an empty result from a missing or broken binary
+        if caps.encoders and path is not None:
+            stored[key] = {
+                "has_nv": caps.has_nv, "has_qsv": caps.has_qsv, "has_vtb": caps.has_vtb,
+                "encoders": sorted(caps.encoders), "version": caps.version,
+            }
+            _save_caps(path, stored)
+        return caps
+
+
+def _save_caps(path: Path, stored: dict) -> None:
+    """Best effort: an unwritable cache only costs a probe next time."""
+    try:
+        # Unique temp name: processes starting together may all write
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".hwcaps-", suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(stored))
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+@lru_cache(maxsize=None)
+def detect_hw_caps() -> HwCaps:
+    """Capabilities of the ffmpeg binary in use.
+
+    Probed once per binary (path, size, mtime) and persisted in the user
+    cache directory, so later calls and later processes spawn nothing.
+    """
+    return _load_caps(ffmpeg_identity())
+
+
+def ffmpeg_version() -> str:
+    return detect_hw_caps().version
+
+
+@lru_cache(maxsize=None)
+def encoder_help(name: str) -> str:
+    """Output of ffmpeg -h encoder=NAME, fetched on first use."""
+    return _run_ffmpeg(["-hide_banner", "-h", f"encoder={name}"])
+
+
+def encoder_options(name: str) -> FrozenSet[str]:
+    """Private option names an encoder accepts (e.g. preset, crf)."""
+    opts = set()
+    for line in encoder_help(name).splitlines():
+        parts = line.split()
+        if parts and parts[0].startswith("-") and len(parts[0]) > 1:
+            opts.add(parts[0][1:])
+    return frozenset(opts)
+
+
+def choose_encoder(
+    hwc: HwCaps,
+    prefer_hevc: bool = False,
+    profile: Optional["HostProfile"] = None,
+    target: Optional["EncodeTarget"] = None,
+) -> str:
+    """Pick a video encoder.
+
+    With a calibrated host profile and a target, the fastest measured
+    encoder meeting the target wins; otherwise hardware encoders are
+    preferred in a fixed order.
+    """
+    if profile is not None and target is not None:
+        pick = profile.pick(hwc, prefer_hevc, target)
+        if pick is not None:
+            return pick.encoder
     if prefer_hevc:
         if hwc.has_nv and "hevc_nvenc" in hwc.encoders:
             return "hevc_nvenc"
@@ -68,4 +203,3 @@ def choose_encoder(hwc: HwCaps, prefer_hevc: bool = False) -> str:
     if hwc.has_vtb and "h264_videotoolbox" in hwc.encoders:
         return "h264_videotoolbox"
     return "libx264"
-
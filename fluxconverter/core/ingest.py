@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Optional, Union
+
+from .paths import cache_dir
+
+
+# Containers ffmpeg can demux front to back from a pipe. Anything else
+# (MP4/MOV keep their index at the end unless faststarted, AVI, ...) is
+# spooled to disk first, since ffmpeg has to seek in it
+STREAMABLE_EXTENSIONS = {
+    ".ts", ".m2ts", ".mts", ".mpg", ".mpeg", ".mkv", ".webm", ".flv", ".nut", ".y4m",
+    ".mp3", ".aac", ".ac3", ".wav", ".flac", ".ogg", ".opus",
+}
+# Upload chunks held between the request body and ffmpeg's stdin; when
+# ffmpeg falls behind the upload is throttled instead of buffered
+PIPE_BUFFER_CHUNKS = 16
+# Disk reserved for a piped upload that arrives without a Content-Length
+UNKNOWN_UPLOAD_BYTES = 1024 ** 3
+
+_END = object()
+
+
+def is_streamable(filename: str) -> bool:
+    return Path(filename).suffix.lower() in STREAMABLE_EXTENSIONS
+
+
+class UploadAborted(RuntimeError):
+    pass
+
+
+class BodyPipe:
+    """Bounded hand-off of an upload's chunks from the request to ffmpeg's stdin.
+
+    The request side puts chunks and blocks while the buffer is full.
+    The ffmpeg side iterates them. Closing from the ffmpeg side (the job
+    failed or was cancelled) makes further puts return False rather than
+    block forever.
+    """
+
+    def __init__(self, max_chunks: int = PIPE_BUFFER_CHUNKS, expected: Optional[int] = None):
+        self._queue: "asyncio.Queue[Union[bytes, object, BaseException]]" = asyncio.Queue(max_chunks)
+        self.closed = False
+        self.received = 0
+        self.expected = expected  # Content-Length, if the client sent one
+
+    @property
+    def size_hint(self) -> int:
+        """Bytes the whole upload is expected to take, for reserving disk up front."""
+        if self.expected is not None:
+            return self.expected
+        return max(self.received, UNKNOWN_UPLOAD_BYTES)
+
+    async def put(self, chunk: bytes) -> bool:
+        """Hand over one chunk; False if nobody is reading any more."""
+        if self.closed:
+            return False
+        await self._queue.put(chunk)
+        self.received += len(chunk)
+        return not self.closed
+
+    async def finish(self) -> None:
+        if not self.closed:
+            await self._queue.put(_END)
+
+    async def abort(self, reason: str) -> None:
+        """The upload broke off: the reader fails instead of seeing a clean end."""
+        if not self.closed:
+            await self._queue.put(UploadAborted(reason))
+
+    def close(self) -> None:
+        self.closed = True
+        # Unblock a writer waiting on a full buffer
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while not self.closed:
+            item = await self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item  # type: ignore[misc]
+
+
+async def spool(chunks: AsyncIterable[bytes], path: Path) -> int:
+    """Write an upload to ``path`` chunk by chunk; returns the bytes written.
+
+    Only one chunk is held in memory at a time. A partial file is removed
+    if the upload breaks off.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    f = await asyncio.to_thread(open, path, "wb")
+    try:
+        async for chunk in chunks:
+            await asyncio.to_thread(f.write, chunk)
+            written += len(chunk)
+    except BaseException:
+        f.close()
+        path.unlink(missing_ok=True)
+        raise
+    await asyncio.to_thread(f.close)
+    return written
+
+
+def upload_dir() -> Path:
+    """Scratch space for spooled uploads (FLUXCONVERTER_UPLOAD_DIR overrides)."""
+    override = os.environ.get("FLUXCONVERTER_UPLOAD_DIR")
+    return Path(override) if override else cache_dir() / "uploads"
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .paths import cache_dir
+
+
+# Progress-only updates are written at most this often; status changes
+# are written immediately
+FLUSH_INTERVAL = 0.5
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+# host:pid:token of this process; the token tells a restarted process
+# apart from its predecessor when the pid is reused (e.g. pid 1 in containers)
+_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _owner_alive(owner: str) -> bool:
+    host, pid, _ = (owner.split(":") + ["", ""])[:3]
+    if owner == _OWNER:
+        return True
+    if host != socket.gethostname():
+        return True  # Can't tell from here; leave it to that host
+    try:
+        pid_num = int(pid)
+        if pid_num == os.getpid():
+            return False  # An earlier process with our pid
+        os.kill(pid_num, 0)
+    except (ProcessLookupError, ValueError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore:
+    """Job records in a WAL-mode SQLite database, shared by API processes.
+
+    Jobs this process runs are also kept in memory, so status reads and
+    per-tick updates never wait on the database. Updates are written in
+    batches; a status change forces a write right away. Finished jobs
+    are dropped from memory once written and read from the database.
+
+    Every write gives its jobs a new ``version``, taken while holding
+    the database's write lock, so versions grow in commit order across
+    processes and a ``changed_since`` cursor never skips a write.
+    """
+
+    def __init__(self, path: Path, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._live: Dict[str, Dict[str, Any]] = {}
+        self._dirty: Set[str] = set()
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, owner TEXT NOT NULL,"
+            " created REAL NOT NULL, updated REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "version" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_version ON jobs (version)")
+
+    @classmethod
+    def from_env(cls) -> "JobStore":
+        path = os.environ.get("FLUXCONVERTER_JOB_DB")
+        return cls(Path(path) if path else cache_dir() / "jobs.sqlite")
+
+    def _next_version(self) -> int:
+        """Version for a write; call inside a BEGIN IMMEDIATE transaction."""
+        # Nanosecond clock, but always past every version already committed
+        (latest,) = self._db.execute("SELECT COALESCE(MAX(version), 0) FROM jobs").fetchone()
+        return max(latest + 1, time.time_ns())
+
+    def current_version(self) -> int:
+        """Version of the latest committed write; a cursor for changes from now on."""
+        with self._lock:
+            (latest,) = self._db.execute("SELECT COALESCE(MAX(version), 0) FROM jobs").fetchone()
+        return latest
+
+    def _read(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._live or self._read(job_id) is not None
+
+    def __getitem__(self, job_id: str) -> Dict[str, Any]:
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._live.get(job_id)
+        if job is not None:
+            return dict(job)
+        return self._read(job_id)
+
+    def owned_elsewhere(self, job_id: str) -> bool:
+        """True if another live process owns this job; only that process can stop it."""
+        with self._lock:
+            row = self._db.execute("SELECT owner FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return row is not None and row[0] != _OWNER and _owner_alive(row[0])
+
+    def __setitem__(self, job_id: str, job: Dict[str, Any]) -> None:
+        """Add a job owned by this process; written immediately."""
+        job = {**job, "created": time.time()}
+        with self._lock:
+            self._live[job_id] = job
+            self._write([job_id])
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            job = self._live.get(job_id)
+            if job is None:
+                job = self._read(job_id)
+                if job is None:
+                    raise KeyError(job_id)
+                self._live[job_id] = job
+            status_changed = "status" in fields and fields["status"] != job.get("status")
+            job.update(fields)
+            self._dirty.add(job_id)
+            if status_changed:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """Write all pending updates in one transaction."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            dirty, self._dirty = list(self._dirty), set()
+            if dirty:
+                self._write(dirty)
+            for job_id in dirty:
+                if self._live.get(job_id, {}).get("status") in FINISHED_STATUSES:
+                    del self._live[job_id]
+
+    def _write(self, job_ids: List[str]) -> None:
+        # IMMEDIATE: the version is taken under the write lock, so it is in commit order
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            version = self._next_version()
+            now = time.time()
+            rows = []
+            for jid in job_ids:
+                job = self._live.get(jid)
+                if job is None:
+                    continue
+                job["version"] = version + len(rows)
+                rows.append((jid, job["status"], _OWNER, job["created"], now, job["version"], json.dumps(job, default=str)))
+            self._db.executemany(
+                "INSERT INTO jobs (id, status, owner, created, updated, version, data) VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET status=excluded.status, owner=excluded.owner,"
+                " updated=excluded.updated, version=excluded.version, data=excluded.data",
+                rows,
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def recover(self) -> List[Dict[str, Any]]:
+        """Claim unfinished jobs left behind by processes that are gone.
+
+        Jobs that were already running or paused are reset to queued; they
+        start over from the beginning.
+        """
+        with self._lock:
+            # IMMEDIATE: two processes starting together can't claim the same job
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Any unfinished status: a job paused when its owner died is orphaned too
+                placeholders = ", ".join("?" * len(FINISHED_STATUSES))
+                rows = self._db.execute(
+                    f"SELECT id, owner, data FROM jobs WHERE status NOT IN ({placeholders}) ORDER BY created",
+                    FINISHED_STATUSES,
+                ).fetchall()
+                claimed: List[str] = []
+                version = self._next_version()
+                for job_id, owner, data in rows:
+                    if _owner_alive(owner):
+                        continue
+                    job = json.loads(data)
+                    job.update(status="queued", progress=0, recovered=True, version=version + len(claimed))
+                    self._db.execute(
+                        "UPDATE jobs SET status=?, owner=?, updated=?, version=?, data=? WHERE id=?",
+                        (job["status"], _OWNER, time.time(), job["version"], json.dumps(job, default=str), job_id),
+                    )
+                    self._live[job_id] = job
+                    claimed.append(job_id)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return [dict(self._live[jid]) for jid in claimed]
+
+    def changed_since(self, version: int, limit: int = 1000) -> Tuple[List[Dict[str, Any]], int]:
+        """Jobs written after ``version``, oldest write first, and the cursor for the next call.
+
+        Sees only committed writes, from this process or any other; progress
+        still waiting for a batched write shows up once it is flushed.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT version, data FROM jobs WHERE version > ? ORDER BY version LIMIT ?", (version, limit)
+            ).fetchall()
+        return [json.loads(data) for _, data in rows], (rows[-1][0] if rows else version)
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+
+
+LIVE_MODES = ("hls", "fmp4")
+# Target fragment/segment length; shorter means earlier first bytes
+LIVE_SEGMENT_SECONDS = 2
+
+MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+    ".ts": "video/mp2t",
+}
+
+
+def live_output_path(output_path: Path, mode: str) -> Path:
+    """Where ffmpeg writes for a live mode: the HLS playlist or the fMP4 file."""
+    if mode == "hls":
+        return output_path.parent / f"{output_path.stem}_hls" / "index.m3u8"
+    return output_path
+
+
+def live_output_args(output_path: Path, mode: str, segment_seconds: int = LIVE_SEGMENT_SECONDS) -> List[str]:
+    """Muxer options that make output readable while ffmpeg is still writing it."""
+    # Regular keyframes so every fragment/segment can start on one
+    args = ["-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})"]
+    if mode == "hls":
+        seg_dir = output_path.parent
+        seg_dir.mkdir(parents=True, exist_ok=True)
+        return args + [
+            "-f", "hls",
+            "-hls_time", str(segment_seconds),
+            "-hls_playlist_type", "event",
+            "-hls_segment_type", "fmp4",
+            "-hls_fmp4_init_filename", "init.mp4",
+            "-hls_segment_filename", str(seg_dir / "seg_%05d.m4s"),
+            "-hls_flags", "independent_segments+temp_file",
+        ]
+    if mode == "fmp4":
+        return args + [
+            "-f", "mp4",
+            "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+            "-frag_duration", str(segment_seconds * 1_000_000),
+        ]
+    raise ValueError(f"unknown live mode: {mode}")
@@ -3,7 +3,7 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 import yaml
 
 
@@ -11,13 +11,50 @@ class Step(BaseModel):
     name: str
     kind: Literal["decode", "filter", "encode"]
     params: dict = Field(default_factory=dict)
+    # Upstream step this one consumes; defaults to the previous step.
+    # Several steps naming the same upstream branch the pipeline.
+    after: Optional[str] = None
 
 
 class PipelineSpec(BaseModel):
     steps: list[Step]
 
+    @model_validator(mode="after")
+    def _check_graph(self) -> "PipelineSpec":
+        if not self.steps or self.steps[0].kind != "decode":
+            raise ValueError("pipeline must start with a decode step")
+        seen: dict[str, Step] = {}
+        for i, step in enumerate(self.steps):
+            if step.name in seen:
+                raise ValueError(f"duplicate step name: {step.name}")
+            if i > 0:
+                if step.kind == "decode":
+                    raise ValueError("pipeline must have exactly one decode step")
+                parent = seen.get(self.parent_of(step) or "")
+                if parent is None:
+                    raise ValueError(f"step {step.name!r}: unknown upstream step {step.after!r}")
+                if parent.kind == "encode":
+                    raise ValueError(f"step {step.name!r}: cannot consume the output of encode step {parent.name!r}")
+            if step.kind == "filter" and not step.params.get("filter"):
+                raise ValueError(f"filter step {step.name!r} needs a 'filter' param")
+            seen[step.name] = step
+        if not self.encode_steps():
+            raise ValueError("pipeline needs at least one encode step")
+        return self
+
+    def parent_of(self, step: Step) -> Optional[str]:
+        if step.after is not None:
+            return step.after
+        idx = next(i for i, s in enumerate(self.steps) if s is step)
+        return self.steps[idx - 1].name if idx > 0 else None
+
+    def children_of(self, name: str) -> list[Step]:
+        return [s for s in self.steps[1:] if self.parent_of(s) == name]
+
+    def encode_steps(self) -> list[Step]:
+        return [s for s in self.steps if s.kind == "encode"]
+
     @classmethod
     def model_validate_yaml(cls, yaml_text: str) -> "PipelineSpec":
         data = yaml.safe_load(yaml_text)
         return cls.model_validate(data)
-
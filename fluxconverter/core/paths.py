@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+
+def cache_dir() -> Path:
+    """Per-user cache directory (FLUXCONVERTER_CACHE_DIR overrides)."""
+    override = os.environ.get("FLUXCONVERTER_CACHE_DIR")
+    if override:
+        path = Path(override)
+    elif os.name == "nt":
+        path = Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local")) / "fluxconverter" / "cache"
+    else:
+        path = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "fluxconverter"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
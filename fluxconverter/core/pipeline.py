@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .hw import _get_ffmpeg_path
+from .models import PipelineSpec, Step
+
+
+IMAGE_FORMATS = {"webp", "png", "jpg", "jpeg", "bmp", "tiff"}
+
+# Encode params passed straight through as ffmpeg output options
+ENCODE_OPTIONS = {
+    "preset": "-preset",
+    "crf": "-crf",
+    "tune": "-tune",
+    "profile": "-profile:v",
+    "pix_fmt": "-pix_fmt",
+    "maxrate": "-maxrate",
+    "bufsize": "-bufsize",
+    "gop": "-g",
+    "fps": "-r",
+    "audio_bitrate": "-b:a",
+    "audio_channels": "-ac",
+    "audio_rate": "-ar",
+}
+AUDIO_PARAMS = {"acodec", "audio_bitrate", "audio_channels", "audio_rate"}
+
+
+@dataclass
+class CompiledPipeline:
+    cmd: List[str]
+    outputs: List[str]
+    filter_graph: Optional[str] = None
+    maps: Dict[str, str] = field(default_factory=dict)
+
+
+def _output_path(step: Step, input_path: str, output_dir: Path, multi: bool) -> Path:
+    if step.params.get("output"):
+        return output_dir / step.params["output"]
+    fmt = step.params.get("format", "mp4")
+    stem = Path(input_path).stem
+    out = output_dir / f"{stem}.{fmt}"
+    # Never overwrite the source
+    if multi or out.resolve() == Path(input_path).resolve():
+        out = output_dir / f"{stem}_{step.name}.{fmt}"
+    return out
+
+
+def _encode_args(step: Step) -> List[str]:
+    p = step.params
+    fmt = p.get("format", "mp4")
+    args: List[str] = []
+    if p.get("vcodec"):
+        args += ["-c:v", str(p["vcodec"])]
+    if p.get("bitrate"):
+        args += ["-b:v", str(p["bitrate"])]
+    if p.get("quality") is not None:
+        args += ["-quality" if fmt == "webp" else "-q:v", str(p["quality"])]
+    image = fmt in IMAGE_FORMATS
+    if not image and p.get("acodec"):
+        args += ["-c:a", str(p["acodec"])]
+    for key, flag in ENCODE_OPTIONS.items():
+        if p.get(key) is not None and not (image and key in AUDIO_PARAMS):
+            args += [flag, str(p[key])]
+    # Anything else ffmpeg takes, verbatim
+    args += [str(a) for a in p.get("args", [])]
+    return args
+
+
+def _filter_graph(spec: PipelineSpec) -> tuple[str, Dict[str, str]]:
+    """Build a -filter_complex graph that decodes once and splits per branch.
+
+    Returns the graph and, for every encode step, the pad label it maps.
+    """
+    graph: List[str] = []
+    maps: Dict[str, str] = {}
+    available: Dict[str, List[str]] = {}
+
+    def fan_out(idx: int, step: Step, label: str) -> List[str]:
+        consumers = spec.children_of(step.name)
+        if len(consumers) <= 1:
+            return [label]
+        outs = [f"[s{idx}_{k}]" for k in range(len(consumers))]
+        graph.append(f"{label}split={len(consumers)}{''.join(outs)}")
+        return outs
+
+    decode = spec.steps[0]
+    available[decode.name] = fan_out(0, decode, "[0:v]")
+    for idx, step in enumerate(spec.steps[1:], start=1):
+        src = available[spec.parent_of(step)].pop(0)
+        if step.kind == "filter":
+            label = f"[s{idx}]"
+            graph.append(f"{src}{step.params['filter']}{label}")
+            available[step.name] = fan_out(idx, step, label)
+        else:
+            maps[step.name] = "0:v:0" if src == "[0:v]" else src
+    return ";".join(graph), maps
+
+
+def _filter_chain(spec: PipelineSpec, step: Step) -> List[str]:
+    chain: List[str] = []
+    name = spec.parent_of(step)
+    by_name = {s.name: s for s in spec.steps}
+    while name is not None:
+        upstream = by_name[name]
+        if upstream.kind == "filter":
+            chain.append(upstream.params["filter"])
+        name = spec.parent_of(upstream)
+    return list(reversed(chain))
+
+
+def compile_pipeline(spec: PipelineSpec, input_path: str, output_dir: Path) -> CompiledPipeline:
+    """Compile a pipeline into a single ffmpeg invocation.
+
+    Linear pipelines use a plain -vf chain. Branching pipelines decode
+    once and feed every encode step from a -filter_complex split, with
+    one output file per encode step.
+    """
+    encodes = spec.encode_steps()
+    multi = len(encodes) > 1
+    cmd = [
+        _get_ffmpeg_path(), "-y",
+        "-hide_banner", "-nostdin", "-nostats",
+        "-progress", "pipe:1",
+        "-i", input_path,
+    ]
+    outputs: List[str] = []
+
+    if not multi:
+        step = encodes[0]
+        chain = _filter_chain(spec, step)
+        if chain:
+            cmd += ["-vf", ",".join(chain)]
+        out = _output_path(step, input_path, output_dir, multi)
+        cmd += _encode_args(step) + [str(out)]
+        return CompiledPipeline(cmd=cmd, outputs=[str(out)])
+
+    graph, maps = _filter_graph(spec)
+    if graph:
+        cmd += ["-filter_complex", graph]
+    for step in encodes:
+        out = _output_path(step, input_path, output_dir, multi)
+        cmd += ["-map", maps[step.name]]
+        if step.params.get("format", "mp4") not in IMAGE_FORMATS:
+            cmd += ["-map", "0:a?"]
+        cmd += _encode_args(step) + [str(out)]
+        outputs.append(str(out))
+    return CompiledPipeline(cmd=cmd, outputs=outputs, filter_graph=graph or None, maps=maps)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .models import PipelineSpec
+from .pipeline import CompiledPipeline, compile_pipeline
+
+
+# Presets shipped with the package; FLUXCONVERTER_PRESET_PATH adds user
+# directories (os.pathsep-separated) whose presets override these by name
+BUNDLED_PRESETS = Path(__file__).parent.parent / "presets"
+PRESET_SUFFIXES = (".yaml", ".yml")
+
+# Stand-ins compiled into cached plans, replaced per job
+_INPUT = "/__fluxconverter_input__/__stem__.src"
+_OUTPUT_DIR = Path("/__fluxconverter_output__")
+_STEM = "__stem__"
+
+
+def preset_dirs() -> List[Path]:
+    dirs = [BUNDLED_PRESETS]
+    extra = os.environ.get("FLUXCONVERTER_PRESET_PATH", "")
+    dirs += [Path(d).expanduser() for d in extra.split(os.pathsep) if d]
+    return dirs
+
+
+@dataclass
+class _Entry:
+    mtime_ns: int
+    spec: PipelineSpec
+    template: Optional[CompiledPipeline] = None
+
+
+class PresetRegistry:
+    """Named pipeline presets, parsed on first use and compiled once.
+
+    The directories are only listed up front. A preset is parsed and
+    validated the first time it is used, and its compiled plan is kept
+    until the file's mtime changes.
+    """
+
+    def __init__(self, dirs: Optional[List[Path]] = None):
+        self.dirs = dirs if dirs is not None else preset_dirs()
+        self._paths: Dict[str, Path] = {}
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Re-list the preset directories (names only, nothing is parsed)."""
+        paths: Dict[str, Path] = {}
+        for d in self.dirs:
+            if not d.is_dir():
+                continue
+            for path in sorted(d.iterdir()):
+                if path.suffix in PRESET_SUFFIXES:
+                    paths[path.stem] = path  # Later directories win
+        with self._lock:
+            self._paths = paths
+
+    def names(self) -> List[str]:
+        return sorted(self._paths)
+
+    def path(self, name: str) -> Path:
+        path = self._paths.get(name)
+        if path is None:
+            self.refresh()  # Added since startup?
+            path = self._paths.get(name)
+        if path is None:
+            raise KeyError(f"Unknown preset: {name}")
+        return path
+
+    def _entry(self, name: str) -> _Entry:
+        path = self.path(name)
+        mtime = path.stat().st_mtime_ns
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.mtime_ns == mtime:
+                return entry
+        spec = PipelineSpec.model_validate_yaml(path.read_text())
+        entry = _Entry(mtime, spec)
+        with self._lock:
+            self._entries[name] = entry
+        return entry
+
+    def spec(self, name: str) -> PipelineSpec:
+        return self._entry(name).spec
+
+    def compile(self, name: str, input_path: str, output_dir: Path) -> CompiledPipeline:
+        """The preset's ffmpeg plan for one input, from the cached compilation."""
+        entry = self._entry(name)
+        if entry.template is None:
+            entry.template = compile_pipeline(entry.spec, _INPUT, _OUTPUT_DIR)
+        compiled = _bind(entry.template, input_path, output_dir)
+        if any(Path(o).resolve() == Path(input_path).resolve() for o in compiled.outputs):
+            # Output would overwrite the source: let the compiler rename it
+            return compile_pipeline(entry.spec, input_path, output_dir)
+        return compiled
+
+
+def _bind(template: CompiledPipeline, input_path: str, output_dir: Path) -> CompiledPipeline:
+    stem = Path(input_path).stem
+    outputs = set(template.outputs)
+
+    def sub(arg: str) -> str:
+        if arg == _INPUT:
+            return input_path
+        if arg in outputs:
+            try:
+                # Keep any directories the output names below the output dir
+                rel = Path(arg).relative_to(_OUTPUT_DIR)
+            except ValueError:
+                return arg  # An absolute output path
+            return str(output_dir / rel.with_name(rel.name.replace(_STEM, stem)))
+        return arg
+
+    return replace(
+        template,
+        cmd=[sub(a) for a in template.cmd],
+        outputs=[sub(o) for o in template.outputs],
+        maps=dict(template.maps),
+    )
+
+
+_registry: Optional[PresetRegistry] = None
+
+
+def preset_registry() -> PresetRegistry:
+    global _registry
+    if _registry is None:
+        _registry = PresetRegistry()
+    return _registry
+
+
+def resolve_spec(config: str) -> Tuple[PipelineSpec, Optional[str]]:
+    """A spec from a YAML file path or a preset name; also returns the preset name.
+
+    Raises FileNotFoundError for a missing file (anything with a YAML
+    suffix or a directory part), KeyError for an unknown preset.
+    """
+    path = Path(config)
+    if path.is_file():
+        return PipelineSpec.model_validate_yaml(path.read_text()), None
+    if path.suffix in PRESET_SUFFIXES or path.name != config:
+        raise FileNotFoundError(f"Pipeline file not found: {config}")
+    return preset_registry().spec(config), config
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import weakref
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .hw import _get_ffprobe_path
+from .paths import cache_dir
+
+
+# Upper bound on concurrently running ffprobe processes
+MAX_CONCURRENT_PROBES = int(os.environ.get("FLUXCONVERTER_MAX_PROBES", os.cpu_count() or 4))
+# Seconds of video packets read to estimate the keyframe interval
+KEYFRAME_SCAN_SECONDS = 20
+
+
+@dataclass
+class StreamInfo:
+    index: int
+    codec_type: str
+    codec_name: Optional[str] = None
+    profile: Optional[str] = None
+    pix_fmt: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    frame_rate: Optional[float] = None
+    bit_rate: Optional[int] = None
+    duration: Optional[float] = None
+    channels: Optional[int] = None
+    sample_rate: Optional[int] = None
+
+
+@dataclass
+class MediaInfo:
+    format_name: Optional[str] = None
+    duration: Optional[float] = None
+    size: Optional[int] = None
+    bit_rate: Optional[int] = None
+    keyframe_interval: Optional[float] = None
+    streams: List[StreamInfo] = field(default_factory=list)
+
+    @property
+    def video(self) -> Optional[StreamInfo]:
+        """The video stream ffmpeg selects by default (highest resolution)."""
+        videos = [s for s in self.streams if s.codec_type == "video"]
+        return max(videos, key=lambda s: (s.width or 0) * (s.height or 0), default=None)
+
+    @property
+    def audio(self) -> Optional[StreamInfo]:
+        """The audio stream ffmpeg selects by default (most channels)."""
+        audios = [s for s in self.streams if s.codec_type == "audio"]
+        return max(audios, key=lambda s: s.channels or 0, default=None)
+
+    @property
+    def frame_rate(self) -> Optional[float]:
+        video = self.video
+        return video.frame_rate if video else None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MediaInfo":
+        data = dict(data)
+        data["streams"] = [StreamInfo(**s) for s in data.get("streams", [])]
+        return cls(**data)
+
+
+def _opt_int(val) -> Optional[int]:
+    try:
+        return int(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def _opt_float(val) -> Optional[float]:
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate(val: Optional[str]) -> Optional[float]:
+    """Parse an ffprobe rational such as 30000/1001."""
+    if not val or "/" not in val:
+        return _opt_float(val)
+    num, den = val.split("/", 1)
+    n, d = _opt_float(num), _opt_float(den)
+    if not n or not d:
+        return None
+    return round(n / d, 3)
+
+
+def _keyframe_interval(packets: List[dict], stream_index: int) -> Optional[float]:
+    times = [
+        t for t in (
+            _opt_float(p.get("pts_time"))
+            for p in packets
+            if p.get("stream_index") == stream_index and "K" in p.get("flags", "")
+        )
+        if t is not None
+    ]
+    if len(times) < 2:
+        return None
+    return round((times[-1] - times[0]) / (len(times) - 1), 3)
+
+
+def parse_probe(data: dict) -> MediaInfo:
+    fmt = data.get("format", {})
+    streams = [
+        StreamInfo(
+            index=int(s.get("index", i)),
+            codec_type=s.get("codec_type", ""),
+            codec_name=s.get("codec_name"),
+            profile=s.get("profile"),
+            pix_fmt=s.get("pix_fmt"),
+            width=_opt_int(s.get("width")),
+            height=_opt_int(s.get("height")),
+            frame_rate=_rate(s.get("avg_frame_rate")) or _rate(s.get("r_frame_rate")),
+            bit_rate=_opt_int(s.get("bit_rate")),
+            duration=_opt_float(s.get("duration")),
+            channels=_opt_int(s.get("channels")),
+            sample_rate=_opt_int(s.get("sample_rate")),
+        )
+        for i, s in enumerate(data.get("streams", []))
+    ]
+    info = MediaInfo(
+        format_name=fmt.get("format_name"),
+        duration=_opt_float(fmt.get("duration")),
+        size=_opt_int(fmt.get("size")),
+        bit_rate=_opt_int(fmt.get("bit_rate")),
+        streams=streams,
+    )
+    video = info.video
+    if video is not None:
+        info.keyframe_interval = _keyframe_interval(data.get("packets", []), video.index)
+    return info
+
+
+@lru_cache(maxsize=None)
+def ffprobe_version() -> str:
+    try:
+        out = subprocess.check_output([_get_ffprobe_path(), "-version"], stderr=subprocess.STDOUT)
+        return out.decode("utf-8", errors="ignore").splitlines()[0].strip()
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        return "unknown"
+
+
+class ProbeCache:
+    """On-disk probe results keyed by (path, size, mtime, ffprobe version)."""
+
+    def __init__(self, path: Path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS probe ("
+            " path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " version TEXT NOT NULL, info TEXT NOT NULL,"
+            " PRIMARY KEY (path, size, mtime_ns, version))"
+        )
+
+    def get(self, key: tuple) -> Optional[MediaInfo]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT info FROM probe WHERE path=? AND size=? AND mtime_ns=? AND version=?", key
+            ).fetchone()
+        return MediaInfo.from_dict(json.loads(row[0])) if row else None
+
+    def put(self, key: tuple, info: MediaInfo) -> None:
+        with self._lock, self._db:
+            # Older entries for the same path are stale once the file changed
+            self._db.execute("DELETE FROM probe WHERE path=?", key[:1])
+            self._db.execute("INSERT INTO probe VALUES (?, ?, ?, ?, ?)", (*key, json.dumps(asdict(info))))
+
+
+_cache: Optional[ProbeCache] = None
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _get_cache() -> ProbeCache:
+    global _cache
+    if _cache is None:
+        _cache = ProbeCache(cache_dir() / "probe.sqlite")
+    return _cache
+
+
+def _semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _semaphores.get(loop)
+    if sem is None:
+        sem = _semaphores[loop] = asyncio.Semaphore(MAX_CONCURRENT_PROBES)
+    return sem
+
+
+async def _run_ffprobe(path: str) -> MediaInfo:
+    process = await asyncio.create_subprocess_exec(
+        _get_ffprobe_path(),
+        "-v", "error",
+        "-print_format", "json",
+        "-show_format", "-show_streams",
+        "-show_entries", "packet=stream_index,pts_time,flags",
+        "-read_intervals", f"%+{KEYFRAME_SCAN_SECONDS}",
+        path,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    out, err = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {err.decode('utf-8', errors='ignore').strip()}")
+    return parse_probe(json.loads(out or b"{}"))
+
+
+async def probe(path: str, use_cache: bool = True) -> MediaInfo:
+    """Return container and stream details for a file.
+
+    Results are cached on disk; an unchanged file (same size and mtime,
+    same ffprobe build) is answered without spawning ffprobe. At most
+    MAX_CONCURRENT_PROBES ffprobe processes run at once.
+    """
+    st = os.stat(path)
+    # Only the first call spawns ffprobe -version; keep it off the event loop
+    version = await asyncio.to_thread(ffprobe_version)
+    key = (str(Path(path).resolve()), st.st_size, st.st_mtime_ns, version)
+    if use_cache:
+        cached = _get_cache().get(key)
+        if cached is not None:
+            return cached
+    async with _semaphore():
+        info = await _run_ffprobe(path)
+    if use_cache:
+        _get_cache().put(key, info)
+    return info
+
+
+async def probe_many(paths: Iterable[str]) -> Dict[str, Optional[MediaInfo]]:
+    """Probe several files concurrently; unreadable files map to None."""
+    paths = list(paths)
+    results = await asyncio.gather(*(probe(p) for p in paths), return_exceptions=True)
+    return {p: (r if isinstance(r, MediaInfo) else None) for p, r in zip(paths, results)}
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .ffmpeg import FfmpegProgress
+
+
+# Samples kept for the instantaneous rate (about 5 s at ffmpeg's default tick)
+WINDOW_SAMPLES = 10
+
+
+class ProgressTracker:
+    """Turn progress snapshots into percent done, encode speed and ETA.
+
+    Percent is media time encoded against the probed duration, capped
+    below 100 until the job actually completes. Instantaneous rates come
+    from a small rolling window, averages from the whole run.
+    """
+
+    def __init__(self, duration: Optional[float], window: int = WINDOW_SAMPLES):
+        self.duration = duration if duration and duration > 0 else None
+        self.started = time.monotonic()
+        # (wall seconds, media seconds, frames)
+        self.samples: Deque[Tuple[float, float, int]] = deque(maxlen=window)
+
+    def update(self, prog: FfmpegProgress) -> Dict[str, Any]:
+        now = time.monotonic()
+        media = (prog.out_time_ms or 0) / 1_000_000
+        frame = prog.frame or 0
+        self.samples.append((now, media, frame))
+        elapsed = now - self.started
+
+        fields: Dict[str, Any] = {"elapsed_seconds": round(elapsed, 1)}
+        if elapsed > 0:
+            fields["avg_fps"] = round(frame / elapsed, 2)
+            fields["avg_speed"] = round(media / elapsed, 3)
+        speed = None
+        first = self.samples[0]
+        span = now - first[0]
+        if span > 0:
+            fields["fps"] = round((frame - first[2]) / span, 2)
+            speed = (media - first[1]) / span
+            fields["speed"] = round(speed, 3)
+        if self.duration is not None:
+            fields["progress"] = round(min(99.0, media / self.duration * 100), 1)
+            rate = speed or fields.get("avg_speed")
+            if rate:
+                fields["eta_seconds"] = round(max(0.0, self.duration - media) / rate, 1)
+        return fields
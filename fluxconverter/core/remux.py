@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from .probe import MediaInfo, StreamInfo
+
+
+# Video codecs each output container takes as-is
+CONTAINER_VIDEO: Dict[str, Set[str]] = {
+    "mp4": {"h264", "hevc"},
+    "mov": {"h264", "hevc", "prores"},
+    "mkv": {"h264", "hevc", "vp8", "vp9", "av1"},
+    "webm": {"vp8", "vp9", "av1"},
+}
+
+# Audio codecs each output container takes as-is
+CONTAINER_AUDIO: Dict[str, Set[str]] = {
+    "mp4": {"aac", "mp3"},
+    "mov": {"aac", "mp3", "alac"},
+    "mkv": {"aac", "mp3", "opus", "vorbis", "flac", "ac3"},
+    "webm": {"opus", "vorbis"},
+    "m4a": {"aac", "alac"},
+    "mp3": {"mp3"},
+    "flac": {"flac"},
+    "wav": {"pcm_s16le"},
+}
+
+# Only broadly decodable profiles / 8-bit 4:2:0 video is copied; 10-bit,
+# 4:2:2 and 4:4:4 sources are re-encoded so the output plays everywhere.
+COPY_PROFILES: Dict[str, Set[str]] = {
+    "h264": {"constrained baseline", "baseline", "main", "high"},
+    "hevc": {"main"},
+}
+COPY_PIX_FMTS = {"yuv420p", "yuvj420p"}
+
+
+@dataclass
+class StreamPlan:
+    vcodec: str
+    acodec: str
+    extra: List[str] = field(default_factory=list)
+
+
+def _can_copy_video(stream: StreamInfo, output_format: str) -> bool:
+    if stream.codec_name not in CONTAINER_VIDEO.get(output_format, set()):
+        return False
+    profiles = COPY_PROFILES.get(stream.codec_name)
+    if profiles is not None and (stream.profile or "").lower() not in profiles:
+        return False
+    return stream.pix_fmt is None or stream.pix_fmt in COPY_PIX_FMTS
+
+
+def _can_copy_audio(stream: StreamInfo, output_format: str) -> bool:
+    return stream.codec_name in CONTAINER_AUDIO.get(output_format, set())
+
+
+def plan_streams(info: Optional[MediaInfo], output_format: str, vcodec: str, acodec: str) -> StreamPlan:
+    """Decide per stream whether to copy or re-encode with the given codecs.
+
+    A stream is copied when the probed source already suits the output
+    container; everything else falls back to ``vcodec``/``acodec``.
+    Without probe information nothing is copied.
+    """
+    plan = StreamPlan(vcodec=vcodec, acodec=acodec)
+    if info is None:
+        return plan
+    video, audio = info.video, info.audio
+    if video is not None and vcodec != "copy" and _can_copy_video(video, output_format):
+        plan.vcodec = "copy"
+        if video.codec_name == "hevc" and output_format in ("mp4", "mov"):
+            # Apple players only accept the hvc1 sample entry
+            plan.extra += ["-tag:v", "hvc1"]
+    if audio is not None and acodec != "copy" and _can_copy_audio(audio, output_format):
+        plan.acodec = "copy"
+    return plan
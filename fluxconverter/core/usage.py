@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+
+_PROC = Path("/proc")
+try:
+    _CLK_TCK = os.sysconf("SC_CLK_TCK")
+except (AttributeError, ValueError, OSError):
+    _CLK_TCK = 100
+
+
+@dataclass
+class ResourceUsage:
+    """What one job cost: CPU, memory, context switches, I/O and throughput."""
+    user_cpu: float = 0.0  # seconds
+    sys_cpu: float = 0.0  # seconds
+    max_rss: int = 0  # bytes
+    voluntary_ctx: int = 0
+    involuntary_ctx: int = 0
+    read_bytes: int = 0  # block I/O
+    write_bytes: int = 0  # block I/O
+    wall_seconds: float = 0.0
+    input_bytes: int = 0
+    output_bytes: int = 0
+    frames: int = 0
+    fps: float = 0.0
+
+    def add(self, other: "ResourceUsage") -> None:
+        """Fold the usage of another (concurrent) child into this one."""
+        self.user_cpu += other.user_cpu
+        self.sys_cpu += other.sys_cpu
+        self.max_rss = max(self.max_rss, other.max_rss)
+        self.voluntary_ctx += other.voluntary_ctx
+        self.involuntary_ctx += other.involuntary_ctx
+        self.read_bytes += other.read_bytes
+        self.write_bytes += other.write_bytes
+        self.frames += other.frames
+
+    def finish(self, wall_seconds: float) -> None:
+        self.wall_seconds = round(wall_seconds, 3)
+        self.fps = round(self.frames / wall_seconds, 2) if wall_seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _read_fields(path: Path) -> dict:
+    fields = {}
+    for line in path.read_text().splitlines():
+        key, _, val = line.partition(":")
+        fields[key.strip()] = val.strip()
+    return fields
+
+
+def sample_process(pid: int, usage: ResourceUsage) -> None:
+    """Update usage from /proc for a running child (Linux; no-op elsewhere).
+
+    asyncio reaps children itself, so os.wait4 is not available to us;
+    counters are sampled while the child runs and the last sample, taken
+    when ffmpeg reports progress=end, stands in for the final rusage.
+    """
+    base = _PROC / str(pid)
+    try:
+        stat = (base / "stat").read_text().rsplit(")", 1)[1].split()
+        usage.user_cpu = max(usage.user_cpu, int(stat[11]) / _CLK_TCK)
+        usage.sys_cpu = max(usage.sys_cpu, int(stat[12]) / _CLK_TCK)
+        status = _read_fields(base / "status")
+        if "VmHWM" in status:
+            usage.max_rss = max(usage.max_rss, int(status["VmHWM"].split()[0]) * 1024)
+        usage.voluntary_ctx = max(usage.voluntary_ctx, int(status.get("voluntary_ctxt_switches", 0)))
+        usage.involuntary_ctx = max(usage.involuntary_ctx, int(status.get("nonvoluntary_ctxt_switches", 0)))
+        io = _read_fields(base / "io")
+        usage.read_bytes = max(usage.read_bytes, int(io.get("read_bytes", 0)))
+        usage.write_bytes = max(usage.write_bytes, int(io.get("write_bytes", 0)))
+    except (OSError, IndexError, ValueError):
+        pass
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import sys
-from typing import List
+from typing import Dict, List, Tuple
 
-from PySide6.QtCore import Qt, QSize, QUrl
+from PySide6.QtCore import Qt, QSize, QUrl, QThread, QTimer, Signal
 from PySide6.QtGui import QAction, QIcon, QDragEnterEvent, QDropEvent
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QToolBar,
@@ -14,6 +14,39 @@ from PySide6.QtWidgets import (
 import requests
 
 
+# How often the job table asks the API for status changes
+STATUS_POLL_MS = 1000
+
+
+class ProbeWorker(QThread):
+    """Probe media files off the UI thread."""
+
+    probed = Signal(str, object)
+
+    def __init__(self, paths: List[str], parent=None):
+        super().__init__(parent)
+        self.paths = paths
+
+    def run(self):
+        import asyncio
+        from ..core.probe import probe_many
+
+        for path, info in asyncio.run(probe_many(self.paths)).items():
+            if info is not None:
+                self.probed.emit(path, info)
+
+
+def _fmt_duration(seconds) -> str:
+    if not seconds:
+        return "—"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _fmt_kbps(bit_rate) -> str:
+    return f"{bit_rate // 1000} kbps" if bit_rate else "—"
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -77,6 +110,14 @@ class MainWindow(QMainWindow):
 
         # Defaults
         self.le_dest.setText(str(self.default_download_path()))
+        self._probe_workers: List[ProbeWorker] = []
+
+        # Job status: one bulk /status?since= poll for every tracked job
+        self._tracked_jobs: Dict[str, Tuple[QTableWidget, int]] = {}
+        self._status_version = 0
+        self._status_timer = QTimer(self)
+        self._status_timer.setInterval(STATUS_POLL_MS)
+        self._status_timer.timeout.connect(self._poll_jobs)
 
     def create_audio_tab(self):
         """Create the Audio conversion tab."""
@@ -290,6 +331,7 @@ class MainWindow(QMainWindow):
         
         for f in files:
             self._append_row(f, current_tab)
+        self._probe_files(files)
 
     def add_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Add folder")
@@ -302,8 +344,24 @@ class MainWindow(QMainWindow):
         table = self._get_current_table()
         rows = sorted({i.row() for i in table.selectedIndexes()}, reverse=True)
         for r in rows:
+            self._cancel_row_job(table, r)
             table.removeRow(r)
 
+    def _cancel_row_job(self, table: QTableWidget, row: int):
+        """Cancel the job running for a row being removed, and shift the rows tracked below it."""
+        for job_id, (t, r) in list(self._tracked_jobs.items()):
+            if t is not table:
+                continue
+            if r == row:
+                del self._tracked_jobs[job_id]
+                try:
+                    # 404/409: already gone or finished, nothing to stop
+                    requests.delete(f"http://127.0.0.1:7845/jobs/{job_id}", timeout=10)
+                except Exception:
+                    pass
+            elif r > row:
+                self._tracked_jobs[job_id] = (t, r - 1)
+
     def process_files(self):
         current_tab = self.tab_widget.currentIndex()
         table = self._get_current_table()
@@ -343,6 +401,7 @@ class MainWindow(QMainWindow):
                     "output_dir": out_dir,
                     "output_format": fmt,
                     "options": options,
+                    "priority": "interactive",
                 },
                 timeout=10,
             )
@@ -416,21 +475,102 @@ class MainWindow(QMainWindow):
             table.setItem(row, i, item("—"))
         table.setItem(row, len(headers) - 1, item("Queued"))
 
+    def _probe_files(self, paths: List[str]):
+        """Fill the info columns from ffprobe (cached for unchanged files)."""
+        if not paths:
+            return
+        worker = ProbeWorker(list(paths), self)
+        worker.probed.connect(self._on_probed)
+        worker.finished.connect(lambda: self._probe_workers.remove(worker))
+        self._probe_workers.append(worker)
+        worker.start()
+
+    def _on_probed(self, path: str, info):
+        size = f"{info.size / (1024 * 1024):.1f}" if info.size else "—"
+        video, audio = info.video, info.audio
+        for tab_index, table in enumerate((self.audio_table, self.video_table, self.image_table)):
+            for row in range(table.rowCount()):
+                cell = table.item(row, 0)
+                if cell is None or cell.toolTip() != path:
+                    continue
+                if tab_index == 0:
+                    values = [size, _fmt_kbps(audio.bit_rate if audio else info.bit_rate)]
+                    values += ["—", f"{audio.sample_rate} Hz" if audio and audio.sample_rate else "—"]
+                elif tab_index == 1:
+                    values = [
+                        size,
+                        f"{video.width}x{video.height}" if video and video.width else "—",
+                        _fmt_duration(info.duration),
+                        video.codec_name if video and video.codec_name else "—",
+                        _fmt_kbps(info.bit_rate),
+                    ]
+                else:
+                    values = [
+                        size,
+                        f"{video.width}x{video.height}" if video and video.width else "—",
+                        video.codec_name if video and video.codec_name else "—",
+                    ]
+                for col, text in enumerate(values, start=1):
+                    it = QTableWidgetItem(text)
+                    it.setFlags(it.flags() ^ Qt.ItemIsEditable)
+                    table.setItem(row, col, it)
+
     def monitor_job(self, job_id: str, row: int, tab_index: int):
-        """Simple job monitoring."""
+        """Track a job's status in its table row until it finishes."""
+        table = (self.audio_table, self.video_table, self.image_table)[tab_index]
         try:
             resp = requests.get(f"http://127.0.0.1:7845/status/{job_id}", timeout=5)
-            if resp.ok:
-                status = resp.json()
-                table = self._get_current_table()
-                if status["status"] == "completed":
-                    table.setItem(row, -1, QTableWidgetItem("Completed"))
-                elif status["status"] == "failed":
-                    table.setItem(row, -1, QTableWidgetItem(f"Failed: {status.get('error', 'Unknown error')}"))
-                elif status["status"] == "processing":
-                    table.setItem(row, -1, QTableWidgetItem(f"Processing... {status.get('progress', 0)}%"))
+            if not resp.ok:
+                return
+            status = resp.json()
+        except Exception:
+            return
+        # Changes after this job's current version arrive with the bulk poll
+        version = status.get("version", 0)
+        self._status_version = min(self._status_version, version) if self._tracked_jobs else version
+        self._tracked_jobs[job_id] = (table, row)
+        self._show_job_status(status)
+        if not self._status_timer.isActive():
+            self._status_timer.start()
+
+    def _poll_jobs(self):
+        """One request for all tracked jobs: only those changed since the last poll come back."""
+        try:
+            resp = requests.get(
+                "http://127.0.0.1:7845/status", params={"since": self._status_version}, timeout=2
+            )
+            if not resp.ok:
+                return
+            data = resp.json()
         except Exception:
-            pass
+            return
+        self._status_version = data["version"]
+        for status in data["jobs"]:
+            self._show_job_status(status)
+        if not self._tracked_jobs:
+            self._status_timer.stop()
+
+    def _show_job_status(self, status: dict):
+        tracked = self._tracked_jobs.get(status.get("id"))
+        if tracked is None:
+            return
+        table, row = tracked
+        state = status["status"]
+        if state == "completed":
+            text = "Completed"
+        elif state == "failed":
+            text = f"Failed: {status.get('error', 'Unknown error')}"
+        elif state == "processing":
+            text = f"Processing... {status.get('progress', 0)}%"
+        elif state == "paused":
+            text = f"Paused at {status.get('progress', 0)}%"
+        elif state == "cancelled":
+            text = "Cancelled"
+        else:
+            text = "Queued"
+        table.setItem(row, table.columnCount() - 1, QTableWidgetItem(text))
+        if state in ("completed", "failed", "cancelled"):
+            del self._tracked_jobs[status["id"]]
 
     def default_download_path(self):
         from pathlib import Path
@@ -448,6 +588,7 @@ class MainWindow(QMainWindow):
         for file_path in files:
             if file_path:
                 self._append_row(file_path, current_tab)
+        self._probe_files([f for f in files if f])
         event.acceptProposedAction()
 
 
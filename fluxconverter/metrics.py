@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import math
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Default buckets, in seconds, for job latencies (queue wait, encode time)
+LATENCY_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+# Encode speed as a multiple of realtime
+SPEED_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+# Event-loop lag, in seconds
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+# How often the event-loop lag probe wakes up
+LAG_PROBE_SECONDS = 0.5
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in sorted(self.values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.bounds = tuple(sorted(buckets))
+        # Per label set: bucket counts (non-cumulative, last is +Inf), sum
+        self.series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = ([0] * (len(self.bounds) + 1), [0.0])
+        series[0][bisect.bisect_left(self.bounds, value)] += 1
+        series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.bounds, math.inf), counts):
+                cumulative += count
+                le = f'le="{_num(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_num(total[0])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+# --- Service metrics -------------------------------------------------------
+
+jobs_total = Counter("fluxconverter_jobs_total", "Jobs finished, by final status.", ["status"])
+queue_wait_seconds = Histogram(
+    "fluxconverter_job_queue_wait_seconds", "Time from submission until encoding started, by priority.", ["priority"])
+encode_seconds = Histogram(
+    "fluxconverter_job_encode_seconds", "Wall time spent encoding, by video encoder.", ["encoder"])
+encode_speed = Histogram(
+    "fluxconverter_encode_speed_ratio", "Encode speed as a multiple of realtime, by video encoder.",
+    ["encoder"], SPEED_BUCKETS)
+encode_frames = Counter(
+    "fluxconverter_encode_frames_total", "Frames encoded, by video encoder.", ["encoder"])
+encode_wall = Counter(
+    "fluxconverter_encode_wall_seconds_total", "Wall seconds spent encoding, by video encoder.", ["encoder"])
+encode_fps = Gauge(
+    "fluxconverter_encode_fps", "Average fps of the last finished job, by video encoder.", ["encoder"])
+cache_requests = Counter(
+    "fluxconverter_cache_requests_total", "Result cache lookups, by result.", ["result"])
+input_bytes = Counter("fluxconverter_input_bytes_total", "Bytes of input read by finished jobs.")
+output_bytes = Counter("fluxconverter_output_bytes_total", "Bytes of output written by finished jobs.")
+ffmpeg_failures = Counter(
+    "fluxconverter_ffmpeg_failures_total", "ffmpeg runs that exited non-zero, by exit code.", ["exit_code"])
+loop_lag = Histogram(
+    "fluxconverter_event_loop_lag_seconds", "How late the event loop ran a timer.", buckets=LAG_BUCKETS)
+loop_lag_last = Gauge("fluxconverter_event_loop_lag_last_seconds", "Most recent event-loop lag sample.")
+
+METRICS: List[_Metric] = [
+    jobs_total, queue_wait_seconds, encode_seconds, encode_speed, encode_frames, encode_wall,
+    encode_fps, cache_requests, input_bytes, output_bytes, ffmpeg_failures, loop_lag, loop_lag_last,
+]
+
+
+def record_encode(encoder: str, wall: float, frames: int, media_seconds: Optional[float]) -> None:
+    encode_seconds.observe(wall, encoder)
+    encode_frames.inc(encoder, amount=frames)
+    encode_wall.inc(encoder, amount=wall)
+    if wall > 0:
+        encode_fps.set(round(frames / wall, 2), encoder)
+        if media_seconds:
+            encode_speed.observe(media_seconds / wall, encoder)
+
+
+async def probe_loop_lag(interval: float = LAG_PROBE_SECONDS) -> None:
+    """Sample how late sleeps wake up; runs until cancelled."""
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.monotonic() - start - interval)
+        loop_lag.observe(lag)
+        loop_lag_last.set(lag)
+
+
+def render(gauges: Sequence[Tuple[str, str, float]] = ()) -> str:
+    """Text exposition of every metric, plus point-in-time (name, help, value) gauges."""
+    lines: List[str] = []
+    for name, help, value in gauges:
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {_num(value)}"]
+    for metric in METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
@@ -1,36 +1,110 @@
 from __future__ import annotations
 
-import asyncio
+import shlex
+from dataclasses import replace
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 import yaml
 
 from .core.models import PipelineSpec
-from .core.ffmpeg import build_cpu_cmd, run_ffmpeg
+from .core.affinity import ResourceLimits
+from .core.calibrate import EncodeTarget, load_profile
+from .core.chunked import DEFAULT_SEGMENT_SECONDS, run_chunked
+from .core.ffmpeg import FfmpegProgress, build_cpu_cmd, run_ffmpeg
 from .core.hw import detect_hw_caps, choose_encoder
+from .core.usage import ResourceUsage
+from .core.pipeline import CompiledPipeline, compile_pipeline
+from .core.presets import preset_registry, resolve_spec
+from .core.probe import probe
+from .core.progress import ProgressTracker
 
 
-async def run_dry(config: Path, preset: Optional[Path] = None) -> None:
-    config_text = Path(config).read_text()
-    spec = PipelineSpec.model_validate_yaml(config_text)
+def _pipeline_source(spec: PipelineSpec, input_path: Optional[Path]) -> Optional[str]:
+    source = input_path or spec.steps[0].params.get("input")
+    return str(source) if source else None
+
+
+def _compile(spec: PipelineSpec, preset_name: Optional[str], source: str, output_dir: Path) -> CompiledPipeline:
+    if preset_name:
+        return preset_registry().compile(preset_name, source, output_dir)
+    return compile_pipeline(spec, source, output_dir)
+
+
+async def run_dry(config: Path | str, preset: Optional[Path] = None, input_path: Optional[Path] = None, output_dir: Path = Path(".")) -> None:
+    spec, preset_name = resolve_spec(str(config))
     plan = {
         "steps": [
             {"name": s.name, "kind": s.kind, "params": s.params} for s in spec.steps
         ]
     }
+    source = _pipeline_source(spec, input_path)
+    if source:
+        compiled = _compile(spec, preset_name, source, output_dir)
+        plan["ffmpeg"] = shlex.join(compiled.cmd)
+        if compiled.filter_graph:
+            plan["filter_graph"] = compiled.filter_graph
+        plan["outputs"] = compiled.outputs
     print(yaml.safe_dump(plan, sort_keys=False))
 
 
-async def run_cpu_transcode(input_path: Path, output_path: Path, scale_filter: Optional[str] = None, prefer_hevc: bool = False) -> None:
+async def run_cpu_transcode(
+    input_path: Path,
+    output_path: Path,
+    scale_filter: Optional[str] = None,
+    prefer_hevc: bool = False,
+    chunked: bool = False,
+    segment_seconds: int = DEFAULT_SEGMENT_SECONDS,
+    workers: Optional[int] = None,
+    limits: Optional[ResourceLimits] = None,
+    target: Optional[EncodeTarget] = None,
+    on_progress: Optional[Callable[[FfmpegProgress], None]] = None,
+) -> ResourceUsage:
+    """Transcode one file on the CPU; progress goes to on_progress, else stdout."""
     hwc = detect_hw_caps()
-    vcodec = choose_encoder(hwc, prefer_hevc=prefer_hevc)
-    # If selected encoder is hardware-specific, but we're forcing CPU path, map to libx264/265
-    if vcodec.endswith("_nvenc") or vcodec.endswith("_qsv") or vcodec.endswith("_videotoolbox"):
-        vcodec = "libx265" if prefer_hevc else "libx264"
-    cmd = build_cpu_cmd(str(input_path), str(output_path), vfilter=scale_filter, vcodec=vcodec)
-    async for prog in run_ffmpeg(cmd):
+    # CPU path: only software encoders are candidates
+    cpu_caps = replace(hwc, has_nv=False, has_qsv=False, has_vtb=False,
+                       encoders=frozenset(e for e in hwc.encoders if e.startswith("lib")))
+    profile = load_profile() if target else None
+    vcodec = choose_encoder(cpu_caps, prefer_hevc=prefer_hevc, profile=profile, target=target)
+    extra = profile.preset_args(vcodec, target) if profile else []
+    usage = ResourceUsage(input_bytes=Path(input_path).stat().st_size)
+    if chunked:
+        cores = limits.cores if limits else None
+        progress = run_chunked(str(input_path), str(output_path), vfilter=scale_filter, vcodec=vcodec, extra=extra, segment_seconds=segment_seconds, workers=workers, cores=cores, usage=usage)
+    else:
+        cmd = build_cpu_cmd(str(input_path), str(output_path), vfilter=scale_filter, vcodec=vcodec, extra=extra)
+        progress = run_ffmpeg(cmd, limits=limits, usage=usage)
+    async for prog in progress:
+        if on_progress is not None:
+            on_progress(prog)
         # Minimal progress print; integrate with API/GUI later
-        if prog.frame is not None or prog.fps is not None or prog.speed is not None:
+        elif prog.frame is not None or prog.fps is not None or prog.speed is not None:
             print(f"frame={prog.frame} fps={prog.fps} speed={prog.speed}")
+    usage.output_bytes = Path(output_path).stat().st_size
+    if on_progress is None:
+        print(
+            f"cpu={usage.user_cpu + usage.sys_cpu:.1f}s wall={usage.wall_seconds:.1f}s "
+            f"max_rss={usage.max_rss // (1024 * 1024)}MB fps={usage.fps}"
+        )
+    return usage
+
 
+async def run_pipeline(config: Path | str, input_path: Optional[Path] = None, output_dir: Path = Path(".")) -> list[str]:
+    """Execute a pipeline spec (file or preset name) as one ffmpeg process; returns the output paths."""
+    spec, preset_name = resolve_spec(str(config))
+    source = _pipeline_source(spec, input_path)
+    if not source:
+        raise ValueError("no input given and the decode step has no 'input' param")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    compiled = _compile(spec, preset_name, source, output_dir)
+    try:
+        info = await probe(source)
+    except (OSError, RuntimeError, ValueError):
+        info = None
+    tracker = ProgressTracker(info.duration if info else None)
+    async for prog in run_ffmpeg(compiled.cmd):
+        state = tracker.update(prog)
+        pct = f"{state['progress']:5.1f}% " if "progress" in state else ""
+        print(f"{pct}frame={prog.frame} fps={prog.fps} speed={prog.speed}")
+    return compiled.outputs
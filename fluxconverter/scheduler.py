@@ -0,0 +1,551 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import shutil
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from .core.control import CAN_PAUSE, JobControl
+from .core.probe import MediaInfo
+
+
+# Relative CPU cost per output frame compared to libx264 at default settings
+ENCODER_COST = {
+    "copy": 0.05,
+    "libx264": 1.0,
+    "libx265": 3.0,
+    "libvpx-vp9": 2.5,
+    "libsvtav1": 2.5,
+    "libaom-av1": 8.0,
+}
+# Hardware encoders keep only a sliver of CPU busy (demux, upload, audio)
+HW_ENCODER_SUFFIXES = ("_nvenc", "_qsv", "_videotoolbox", "_vaapi", "_amf")
+HW_ENCODER_COST = 0.25
+
+# Cores a 1080p libx264 encode keeps busy, and bytes held per frame in flight
+CORES_PER_1080P = 4.0
+FRAMES_IN_FLIGHT = 40
+BASE_MEMORY = 150 * 1024 ** 2
+PIXELS_1080P = 1920 * 1080
+
+# Free space always left on the output filesystem
+DISK_RESERVE = 1024 ** 3
+
+# Pending jobs accepted before /run pushes back (FLUXCONVERTER_MAX_QUEUE)
+DEFAULT_MAX_QUEUE = 1000
+# Completions remembered for the throughput estimate behind Retry-After
+THROUGHPUT_WINDOW = 300.0
+RETRY_AFTER_MIN = 1
+RETRY_AFTER_MAX = 600
+# Suggested when nothing has finished recently to estimate from
+RETRY_AFTER_DEFAULT = 30
+
+# Priority classes and their weight: under contention each class gets
+# dispatch slots in proportion to its weight, split fairly across clients
+PRIORITIES = {"interactive": 8.0, "normal": 4.0, "bulk": 1.0}
+DEFAULT_PRIORITY = "normal"
+# Classes whose running jobs may be paused while a higher class waits
+# (FLUXCONVERTER_PREEMPT=0 turns this off)
+PREEMPTIBLE_PRIORITIES = ("bulk",)
+# Pending jobs a single client may hold (FLUXCONVERTER_MAX_QUEUE_PER_CLIENT, 0 = no limit)
+DEFAULT_MAX_QUEUE_PER_CLIENT = 0
+
+
+@dataclass
+class JobCost:
+    cpu: float  # cores kept busy while running
+    memory: int  # peak resident bytes
+    disk: int  # output bytes expected
+    work: float  # total work in 1080p-libx264-seconds
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def encoder_factor(vcodec: str) -> float:
+    if vcodec.endswith(HW_ENCODER_SUFFIXES):
+        return HW_ENCODER_COST
+    return ENCODER_COST.get(vcodec, 1.0)
+
+
+def estimate_cost(info: Optional[MediaInfo], vcodec: str, input_size: int) -> JobCost:
+    """Estimate a conversion's resource needs from probed resolution, duration and encoder."""
+    video = info.video if info else None
+    duration = (info.duration if info else None) or 0.0
+    if info is None and vcodec != "copy":
+        # Not probed (e.g. a piped upload) but encoding video: assume 1080p
+        pixels = PIXELS_1080P
+    elif video is None or not video.width or not video.height:
+        # Audio-only or unknown: a single core and little memory
+        return JobCost(cpu=1.0, memory=BASE_MEMORY, disk=input_size, work=duration * 0.05)
+    else:
+        pixels = video.width * video.height
+    rel = pixels / PIXELS_1080P
+    factor = encoder_factor(vcodec)
+    cpus = os.cpu_count() or 1
+    cpu = min(float(cpus), max(0.5, rel * factor * CORES_PER_1080P))
+    memory = BASE_MEMORY + int(pixels * 1.5 * FRAMES_IN_FLIGHT * min(factor, 2.0))
+    return JobCost(cpu=round(cpu, 2), memory=memory, disk=input_size, work=round(rel * factor * duration, 1))
+
+
+def _preempt_from_env() -> bool:
+    return os.environ.get("FLUXCONVERTER_PREEMPT", "1") not in ("0", "false", "no")
+
+
+def _default_memory_budget() -> int:
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        total = 8 * 1024 ** 3
+    return int(total * 0.75)
+
+
+@dataclass(eq=False)
+class _Slot:
+    """A job waiting for, or holding, admission."""
+    cost: JobCost
+    rank: float
+    output_dir: Path
+    control: Optional[JobControl] = None
+    on_pause: Optional[Callable[[bool], None]] = None
+    preemptible: bool = False  # may be paused for a higher class
+    paused: bool = False
+
+
+class AdmissionController:
+    """Admit jobs only while their summed cost fits the CPU/memory budget.
+
+    Waiting jobs are admitted strictly in order (by priority class, then
+    arrival) so a large job is never starved by a stream of small ones.
+    A job that exceeds the budget on its own is admitted once nothing
+    else is running.
+
+    When a waiting job outranks running bulk jobs and pausing some of
+    them would let it fit, they are stopped (SIGSTOP) and their CPU is
+    handed over. Paused jobs keep their memory and disk reservations
+    and resume as soon as no higher class is waiting and CPU is free,
+    ahead of anything new of their own class.
+    """
+
+    def __init__(self, cpu_budget: float, memory_budget: int, disk_reserve: int = DISK_RESERVE, preempt: bool = True):
+        self.cpu_budget = cpu_budget
+        self.memory_budget = memory_budget
+        self.disk_reserve = disk_reserve
+        self.preempt = preempt and CAN_PAUSE
+        self.cpu_used = 0.0
+        self.memory_used = 0
+        self.disk_pending = 0
+        self.running = 0
+        self._waiting: Deque[_Slot] = deque()
+        self._admitted: List[_Slot] = []
+        self._cond = asyncio.Condition()
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        cpu = float(os.environ.get("FLUXCONVERTER_CPU_BUDGET", os.cpu_count() or 1))
+        memory = int(os.environ.get("FLUXCONVERTER_MEMORY_BUDGET", _default_memory_budget()))
+        return cls(cpu, memory, preempt=_preempt_from_env())
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def paused(self) -> int:
+        return sum(1 for s in self._admitted if s.paused)
+
+    def _disk_fits(self, cost: JobCost, output_dir: Path) -> bool:
+        free = shutil.disk_usage(output_dir).free
+        return free - self.disk_pending - cost.disk >= self.disk_reserve
+
+    def _fits(self, slot: _Slot, freed_cpu: float = 0.0, freed_jobs: int = 0) -> bool:
+        cost = slot.cost
+        if not self._disk_fits(cost, slot.output_dir):
+            if self.running == 0:
+                raise RuntimeError(f"Not enough free disk space in {slot.output_dir} for this job")
+            return False
+        # Paused jobs go before anything new of their own class
+        if any(s.paused and s.rank >= slot.rank for s in self._admitted):
+            return False
+        if self.running - self.paused - freed_jobs == 0:
+            return True
+        return (
+            self.cpu_used - freed_cpu + cost.cpu <= self.cpu_budget
+            and self.memory_used + cost.memory <= self.memory_budget
+        )
+
+    def _preempt_for(self, slot: _Slot) -> bool:
+        """Pause lower-class jobs, largest first, if that lets ``slot`` fit."""
+        if not self.preempt:
+            return False
+        victims = sorted(
+            (s for s in self._admitted if s.preemptible and not s.paused and s.rank < slot.rank),
+            key=lambda s: s.cost.cpu, reverse=True,
+        )
+        chosen: List[_Slot] = []
+        freed = 0.0
+        for victim in victims:
+            if self._fits(slot, freed, len(chosen)):
+                break
+            chosen.append(victim)
+            freed += victim.cost.cpu
+        if not chosen or not self._fits(slot, freed, len(chosen)):
+            return False
+        for victim in chosen:
+            victim.paused = True
+            self.cpu_used -= victim.cost.cpu
+            victim.control.pause()
+            if victim.on_pause:
+                victim.on_pause(True)
+        return True
+
+    def _resume_paused(self) -> None:
+        # Highest class first: a paused job may have been promoted
+        for slot in sorted(self._admitted, key=lambda s: -s.rank):
+            if not slot.paused:
+                continue
+            if self._waiting and self._waiting[0].rank > slot.rank:
+                break  # Still yielding to a higher class
+            if self.running - self.paused > 0 and self.cpu_used + slot.cost.cpu > self.cpu_budget:
+                break
+            slot.paused = False
+            self.cpu_used += slot.cost.cpu
+            slot.control.resume()
+            if slot.on_pause:
+                slot.on_pause(False)
+
+    def _enqueue(self, slot: _Slot) -> None:
+        # Behind every waiter of the same or a higher class
+        at = next((i for i, s in enumerate(self._waiting) if s.rank < slot.rank), len(self._waiting))
+        self._waiting.insert(at, slot)
+
+    def _ready(self, slot: _Slot) -> bool:
+        if self._waiting[0] is not slot:
+            return False
+        return self._fits(slot) or self._preempt_for(slot)
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        cost: JobCost,
+        output_dir: Path,
+        priority: str = DEFAULT_PRIORITY,
+        control: Optional[JobControl] = None,
+        on_pause: Optional[Callable[[bool], None]] = None,
+    ) -> AsyncIterator[None]:
+        """Hold a share of the budget while the body runs.
+
+        With ``control``, a job of a preemptible class may be paused
+        for higher classes; ``on_pause`` is told when it stops and resumes.
+        """
+        rank = PRIORITIES.get(priority, PRIORITIES[DEFAULT_PRIORITY])
+        preemptible = priority in PREEMPTIBLE_PRIORITIES and control is not None
+        slot = _Slot(cost, rank, output_dir, control, on_pause, preemptible)
+        async with self._cond:
+            self._enqueue(slot)
+            try:
+                await self._cond.wait_for(lambda: self._ready(slot))
+                self.cpu_used += cost.cpu
+                self.memory_used += cost.memory
+                self.disk_pending += cost.disk
+                self.running += 1
+                self._admitted.append(slot)
+            finally:
+                self._waiting.remove(slot)
+                # Paused jobs, or the next job in line, may fit as well
+                self._resume_paused()
+                self._cond.notify_all()
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._admitted.remove(slot)
+                if slot.paused:
+                    slot.paused = False  # Its CPU was already handed over
+                else:
+                    self.cpu_used -= cost.cpu
+                self.memory_used -= cost.memory
+                self.disk_pending -= cost.disk
+                self.running -= 1
+                self._resume_paused()
+                self._cond.notify_all()
+
+    async def promote(self, control: JobControl, priority: str) -> None:
+        """Move the job admitted (or waiting) with ``control`` up to ``priority``.
+
+        A waiting job moves up the line; a running one stops being
+        preemptible and, if paused, resumes ahead of the lower classes.
+        """
+        rank = PRIORITIES[priority]
+        async with self._cond:
+            slot = next((s for s in [*self._waiting, *self._admitted] if s.control is control), None)
+            if slot is None or slot.rank >= rank:
+                return
+            slot.rank = rank
+            slot.preemptible = priority in PREEMPTIBLE_PRIORITIES
+            if slot in self._waiting:
+                self._waiting.remove(slot)
+                self._enqueue(slot)
+            self._resume_paused()
+            self._cond.notify_all()
+
+
+class QueueFull(RuntimeError):
+    def __init__(self, retry_after: int, message: str = "job queue is full"):
+        self.retry_after = retry_after
+        super().__init__(f"{message}, retry in {retry_after}s")
+
+
+class ClientQueueFull(QueueFull):
+    def __init__(self, client: str, retry_after: int):
+        self.client = client
+        super().__init__(retry_after, f"client {client!r} has too many pending jobs")
+
+
+class JobQueue:
+    """Bounded queue of pending jobs, drained by a fixed set of worker coroutines.
+
+    Jobs are dispatched by self-clocked weighted fair queuing: each
+    (priority, client) pair is a flow, and a job's tag is its flow's
+    previous tag (or the current virtual time, if later) plus
+    1 / weight. Lowest tag goes first, so an interactive job lands near
+    the front even behind thousands of bulk jobs, and a client flooding
+    the queue only delays its own later jobs.
+
+    Workers only bound how many jobs are in flight; admission by cost
+    still decides when each one actually starts encoding. Jobs of a
+    preemptible class don't count against that bound for higher
+    classes: while they hold every worker, a higher-class job starts
+    on a borrowed one, so it reaches admission and can pause them.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_depth: int = DEFAULT_MAX_QUEUE,
+        max_per_client: int = DEFAULT_MAX_QUEUE_PER_CLIENT,
+        preempt: bool = True,
+    ):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.max_per_client = max_per_client
+        self.preempt = preempt and CAN_PAUSE
+        self._heap: List[Tuple[float, int, Tuple[str, str], Optional[str], Callable[[], Awaitable[None]]]] = []
+        self._seq = itertools.count()
+        self._ready = asyncio.Semaphore(0)
+        self._vtime = 0.0
+        # Tag of the newest queued job per flow; dropped once the flow drains
+        self._last_tag: Dict[Tuple[str, str], float] = {}
+        self._pending: Dict[str, int] = {}
+        # Running jobs by key, so they can be cancelled
+        self._running: Dict[str, asyncio.Task] = {}
+        self._tasks: List[asyncio.Task] = []
+        # Jobs running on borrowed workers
+        self._borrowed: Set[asyncio.Task] = set()
+        self._completed: Deque[float] = deque()
+        self.active = 0
+        self.active_preemptible = 0
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        workers = int(os.environ.get("FLUXCONVERTER_WORKERS", max(2, os.cpu_count() or 1)))
+        depth = int(os.environ.get("FLUXCONVERTER_MAX_QUEUE", DEFAULT_MAX_QUEUE))
+        per_client = int(os.environ.get("FLUXCONVERTER_MAX_QUEUE_PER_CLIENT", DEFAULT_MAX_QUEUE_PER_CLIENT))
+        return cls(workers, depth, per_client, _preempt_from_env())
+
+    @property
+    def depth(self) -> int:
+        return len(self._heap)
+
+    def pending(self, client: str) -> int:
+        return self._pending.get(client, 0)
+
+    @property
+    def full(self) -> bool:
+        return self.depth >= self.max_depth
+
+    def throughput(self) -> float:
+        """Jobs finished per second over the recent window."""
+        now = time.monotonic()
+        while self._completed and now - self._completed[0] > THROUGHPUT_WINDOW:
+            self._completed.popleft()
+        if not self._completed:
+            return 0.0
+        span = max(now - self._completed[0], 1.0)
+        return len(self._completed) / span
+
+    def retry_after(self) -> int:
+        """Seconds until the queue has likely drained enough to take a job."""
+        rate = self.throughput()
+        if rate <= 0:
+            return RETRY_AFTER_DEFAULT
+        excess = self.depth - self.max_depth + 1
+        return int(min(RETRY_AFTER_MAX, max(RETRY_AFTER_MIN, math.ceil(excess / rate))))
+
+    def check(self, client: str = "") -> None:
+        """Raise QueueFull (or ClientQueueFull) if a new job would not be accepted."""
+        if self.full:
+            raise QueueFull(self.retry_after())
+        if self.max_per_client and self.pending(client) >= self.max_per_client:
+            raise ClientQueueFull(client, self.retry_after())
+
+    def submit(
+        self,
+        job: Callable[[], Awaitable[None]],
+        force: bool = False,
+        priority: str = DEFAULT_PRIORITY,
+        client: str = "",
+        key: Optional[str] = None,
+    ) -> None:
+        """Queue a job; ``key`` (e.g. the job id) lets it be cancelled later."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        if not force:
+            self.check(client)
+        self._push(job, priority, client, key)
+        self._ready.release()
+        self._borrow_workers()
+
+    def reprioritize(self, key: str, priority: str) -> bool:
+        """Move a queued job up to a higher class, keeping its client.
+
+        Returns False if no job with this key is queued.
+        """
+        for i, entry in enumerate(self._heap):
+            if entry[3] == key:
+                break
+        else:
+            return False
+        current, client = entry[2]
+        if PRIORITIES[priority] > PRIORITIES[current]:
+            _, _, job = self._remove(i)
+            # Its semaphore permit is still there
+            self._push(job, priority, client, key)
+            self._borrow_workers()
+        return True
+
+    def _push(self, job: Callable[[], Awaitable[None]], priority: str, client: str, key: Optional[str]) -> None:
+        flow = (priority, client)
+        tag = max(self._vtime, self._last_tag.get(flow, 0.0)) + 1.0 / PRIORITIES[priority]
+        self._last_tag[flow] = tag
+        self._pending[client] = self.pending(client) + 1
+        heapq.heappush(self._heap, (tag, next(self._seq), flow, key, job))
+
+    def _dequeued(self, flow: Tuple[str, str]) -> None:
+        client = flow[1]
+        self._pending[client] -= 1
+        if not self._pending[client]:
+            del self._pending[client]
+
+    def _next(self) -> Tuple[Optional[str], str, Callable[[], Awaitable[None]]]:
+        tag, _, flow, key, job = heapq.heappop(self._heap)
+        self._vtime = tag
+        if self._last_tag.get(flow) == tag:
+            del self._last_tag[flow]
+        self._dequeued(flow)
+        return key, flow[0], job
+
+    def _remove(self, i: int) -> Tuple[Optional[str], str, Callable[[], Awaitable[None]]]:
+        """Take the job at heap index ``i`` out of turn.
+
+        Its semaphore permit stays behind; the worker that takes it
+        finds the heap short and skips it.
+        """
+        _, _, flow, key, job = self._heap[i]
+        self._heap[i] = self._heap[-1]
+        self._heap.pop()
+        heapq.heapify(self._heap)
+        tags = [e[0] for e in self._heap if e[2] == flow]
+        if tags:
+            self._last_tag[flow] = max(tags)
+        else:
+            self._last_tag.pop(flow, None)
+        self._dequeued(flow)
+        return key, flow[0], job
+
+    def _borrow_workers(self) -> None:
+        """Start higher-class jobs on workers held by preemptible ones.
+
+        Only while every worker is busy, and never more of them than the
+        cap allows for non-preemptible jobs; earliest tag first.
+        """
+        if not self.preempt:
+            return
+        while self._tasks and self.active >= self.workers and self.active - self.active_preemptible < self.workers:
+            waiting = [
+                (entry[0], entry[1], i) for i, entry in enumerate(self._heap)
+                if entry[2][0] not in PREEMPTIBLE_PRIORITIES
+            ]
+            if not waiting:
+                return
+            key, priority, job = self._remove(min(waiting)[2])
+            task = asyncio.create_task(self._run(key, priority, job))
+            self._borrowed.add(task)
+            task.add_done_callback(self._borrowed.discard)
+
+    async def cancel(self, key: str) -> bool:
+        """Drop a queued job, or cancel a running one and wait for it to unwind.
+
+        Returns False if no job with this key is queued or running.
+        """
+        for i, entry in enumerate(self._heap):
+            if entry[3] == key:
+                self._remove(i)
+                return True
+        task = self._running.get(key)
+        if task is None:
+            return False
+        task.cancel()
+        await asyncio.wait([task])
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            await self._ready.acquire()
+            if not self._heap:
+                continue  # Its job was cancelled or started on a borrowed worker
+            await self._run(*self._next())
+
+    async def _run(self, key: Optional[str], priority: str, job: Callable[[], Awaitable[None]]) -> None:
+        task = asyncio.create_task(job())
+        if key is not None:
+            self._running[key] = task
+        preemptible = priority in PREEMPTIBLE_PRIORITIES
+        self.active += 1
+        self.active_preemptible += preemptible
+        # A preemptible job may just have taken the last free worker
+        self._borrow_workers()
+        try:
+            # wait(), not await: a cancelled job must not take the worker down with it
+            await asyncio.wait([task])
+            if not task.cancelled():
+                task.exception()  # Jobs record their own failures
+        except asyncio.CancelledError:
+            task.cancel()
+            await asyncio.wait([task])
+            raise
+        finally:
+            if key is not None:
+                self._running.pop(key, None)
+            self.active -= 1
+            self.active_preemptible -= preemptible
+            self._completed.append(time.monotonic())
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        tasks = self._tasks + list(self._borrowed)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import resource
+import sys
+
+import pytest
+
+from fluxconverter.core.affinity import CorePool, ResourceLimits, parse_cpulist
+from fluxconverter.core.ffmpeg import run_ffmpeg
+
+
+def test_parse_cpulist():
+    assert parse_cpulist("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpulist("") == []
+
+
+def test_single_output_gets_threads_before_it():
+    cmd = ["ffmpeg", "-i", "in.mkv", "-c:v", "libx264", "out.mp4"]
+    assert ResourceLimits(threads=2).apply_to(cmd) == [
+        "ffmpeg", "-filter_threads", "2", "-i", "in.mkv", "-c:v", "libx264", "-threads", "2", "out.mp4",
+    ]
+    assert ResourceLimits().apply_to(cmd) == cmd
+
+
+def test_every_output_of_a_ladder_is_limited():
+    cmd = [
+        "ffmpeg", "-i", "in.mkv", "-filter_complex", "[0:v]split=2[a][b]",
+        "-map", "[a]", "-b:v", "5M", "hi.mp4",
+        "-map", "[b]", "-b:v", "2M", "lo.mp4",
+    ]
+    limited = ResourceLimits(threads=4).apply_to(cmd, ["hi.mp4", "lo.mp4"])
+    assert limited[1:5] == ["-filter_threads", "4", "-filter_complex_threads", "4"]
+    assert limited[limited.index("hi.mp4") - 2:limited.index("hi.mp4")] == ["-threads", "4"]
+    assert limited[-3:] == ["-threads", "4", "lo.mp4"]
+    assert limited.count("-threads") == 2
+
+
+def test_an_input_named_like_an_output_is_left_alone():
+    cmd = ["ffmpeg", "-i", "same.mp4", "-f", "null", "same.mp4"]
+    limited = ResourceLimits(threads=1).apply_to(cmd, ["same.mp4"])
+    assert limited.count("-threads") == 1 and limited[-3:] == ["-threads", "1", "same.mp4"]
+
+
+def test_core_pool_spreads_jobs_and_stays_on_one_node():
+    pool = CorePool([[0, 1, 2, 3], [4, 5, 6, 7]])
+    first = pool.acquire(3)
+    second = pool.acquire(3)
+    assert len({c // 4 for c in first}) == 1 and len({c // 4 for c in second}) == 1
+    assert not set(first) & set(second)
+    pool.release(first)
+    assert pool.acquire(4) == [0, 1, 2, 3]
+    assert len(pool.acquire(16)) == 8
+
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="no CPU affinity on this platform")
+def test_limits_are_applied_to_the_running_child():
+    core = min(os.sched_getaffinity(0))
+    # Reports its own affinity and memory limit as progress fields
+    script = (
+        "import os, resource, time; time.sleep(0.3);"
+        "print(f'frame={min(os.sched_getaffinity(0))}');"
+        "print(f'total_size={len(os.sched_getaffinity(0))}');"
+        "print(f'dup_frames={resource.getrlimit(resource.RLIMIT_DATA)[0]}');"
+        "print('progress=end')"
+    )
+    limits = ResourceLimits(cores=[core], memory_bytes=2 * 1024 ** 3)
+
+    async def main():
+        return [s async for s in run_ffmpeg([sys.executable, "-c", script], limits=limits)]
+
+    snap = asyncio.run(main())[-1]
+    assert (snap.frame, snap.total_size) == (core, 1)
+    assert snap.dup_frames == 2 * 1024 ** 3
+    # The server itself is left alone
+    assert resource.getrlimit(resource.RLIMIT_DATA)[0] != 2 * 1024 ** 3
@@ -0,0 +1,40 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from fluxconverter import api
+from fluxconverter.core.jobstore import JobStore
+
+
+def test_every_lifespan_runs_jobs_on_its_own_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "_jobs", JobStore(tmp_path / "jobs.sqlite"))
+    app = api.create_app()
+
+    async def main():
+        async with app.router.lifespan_context(app):
+            ran = asyncio.Event()
+
+            async def job():
+                ran.set()
+
+            await asyncio.sleep(0.01)  # Workers are waiting for work
+            app.state.job_queue.submit(job)
+            await asyncio.wait_for(ran.wait(), 1.0)
+            waiter = asyncio.create_task(api._wait_changed(1.0))
+            await asyncio.sleep(0)
+            api._notify_changed()
+            assert await waiter
+
+    # A second lifespan, as when the app is served or tested again, runs on a new loop
+    asyncio.run(main())
+    asyncio.run(main())
+
+
+def test_uploads_of_one_filename_get_their_own_outputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "_jobs", JobStore(tmp_path / "jobs.sqlite"))
+    monkeypatch.setenv("FLUXCONVERTER_CACHE_DIR", str(tmp_path / "cache"))
+    params = {"output_dir": str(tmp_path / "out"), "output_format": "mp4", "mode": "spool"}
+    with TestClient(api.create_app()) as client:
+        first, second = (client.post("/upload", params=params, content=b"data").json() for _ in range(2))
+    assert first["output_path"] != second["output_path"]
+    assert first["output_path"] == str(tmp_path / "out" / f"upload-{first['job_id']}.mp4")
@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+import pytest
+
+from fluxconverter import batch
+from fluxconverter.batch import iter_items, journal_outputs, run_batch
+from fluxconverter.core.ffmpeg import FfmpegError
+from fluxconverter.core.usage import ResourceUsage
+
+
+@pytest.fixture
+def transcode(monkeypatch):
+    """Fake conversion: writes the output, or fails for inputs named 'bad*'."""
+    calls = []
+
+    async def fake(input_path, output_path, **kwargs):
+        calls.append(input_path)
+        output_path.write_bytes(b"converted")
+        if input_path.name.startswith("bad"):
+            raise FfmpegError(1, ["Invalid data found when processing input"])
+        return ResourceUsage()
+
+    monkeypatch.setattr(batch, "run_cpu_transcode", fake)
+    return calls
+
+
+def _run(items, journal):
+    return asyncio.run(run_batch(items, journal, workers=2, report=lambda line: None))
+
+
+def test_in_place_batch_never_overwrites_a_source(tmp_path, transcode):
+    for name in ("x.mkv", "x.mp4"):
+        (tmp_path / name).write_bytes(b"source")
+    items = list(iter_items(str(tmp_path), tmp_path, "mp4"))
+    assert [(i.input_path.name, i.output_path.name) for i in items] == [("x.mkv", "x_1.mp4"), ("x.mp4", "x_2.mp4")]
+    journal = tmp_path / "journal.jsonl"
+    stats = _run(iter(items), journal)
+    assert stats.done == 2
+    assert (tmp_path / "x.mp4").read_bytes() == b"source"
+
+
+def test_rerun_reuses_its_own_outputs_and_never_takes_them_as_inputs(tmp_path, transcode):
+    (tmp_path / "a.mkv").write_bytes(b"source")
+    (tmp_path / "bad.mkv").write_bytes(b"source")
+    journal = tmp_path / "journal.jsonl"
+    _run(iter_items(str(tmp_path), tmp_path, "mp4"), journal)
+    assert not (tmp_path / "bad.mp4").exists()
+    # A crash left a partial output behind
+    (tmp_path / "bad.mp4").write_bytes(b"partial")
+    transcode.clear()
+    items = list(iter_items(str(tmp_path), tmp_path, "mp4", owned=journal_outputs(journal)))
+    assert [(i.input_path.name, i.output_path.name) for i in items] == [("a.mkv", "a.mp4"), ("bad.mkv", "bad.mp4")]
+    _run(iter(items), journal)
+    assert [p.name for p in transcode] == ["bad.mkv"]
+
+
+def test_existing_files_in_the_output_directory_are_kept(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    (src / "sub").mkdir(parents=True)
+    (src / "sub" / "clip.mov").write_bytes(b"source")
+    (out / "sub").mkdir(parents=True)
+    (out / "sub" / "clip.mp4").write_bytes(b"someone else's")
+    [item] = iter_items(str(src / "**" / "*.mov"), out, "mp4")
+    assert item.output_path == out / "sub" / "clip_1.mp4"
+
+
+def test_journal_records_the_claimed_output_first(tmp_path, transcode):
+    (tmp_path / "a.mkv").write_bytes(b"source")
+    journal = tmp_path / "journal.jsonl"
+    _run(iter_items(str(tmp_path), tmp_path / "out", "mp4"), journal)
+    statuses = [json.loads(line)["status"] for line in journal.read_text().splitlines()]
+    assert statuses == ["started", "done"]
+    assert journal_outputs(journal) == {str((tmp_path / "out" / "a.mp4").resolve())}
+
+
+def test_unusable_manifest_rows_fail_alone(tmp_path, transcode):
+    (tmp_path / "a.mkv").write_bytes(b"source")
+    manifest = tmp_path / "list.jsonl"
+    manifest.write_text("\n".join([
+        json.dumps({"output": str(tmp_path / "x.mp4")}),
+        "{not json",
+        json.dumps({"input": str(tmp_path / "a.mkv")}),
+        json.dumps(["a.mkv"]),
+    ]) + "\n")
+    journal = tmp_path / "journal.jsonl"
+    stats = _run(iter_items(str(manifest), tmp_path / "out", "mp4"), journal)
+    assert (stats.done, stats.failed) == (1, 3)
+    failed = [json.loads(line) for line in journal.read_text().splitlines()]
+    assert [e["input"] for e in failed if e["status"] == "failed"] == [f"{manifest}:{n}" for n in (1, 2, 4)]
+
+
+def test_csv_row_without_input_is_reported(tmp_path):
+    manifest = tmp_path / "list.csv"
+    manifest.write_text("input,output\n,out.mp4\nclip.mkv,\n")
+    items = list(iter_items(str(manifest), tmp_path, "mp4"))
+    assert items[0].error == "no input given" and items[0].input_path.name == "list.csv:2"
+    assert items[1].error is None and items[1].output_path == tmp_path / "clip.mp4"
+
+
+def test_resume_matches_relative_and_absolute_inputs(tmp_path, transcode, monkeypatch):
+    (tmp_path / "a.mkv").write_bytes(b"source")
+    journal = tmp_path / "journal.jsonl"
+    _run(iter_items(str(tmp_path / "*.mkv"), tmp_path / "out", "mp4"), journal)
+    monkeypatch.chdir(tmp_path)
+    transcode.clear()
+    stats = _run(iter_items("*.mkv", tmp_path / "out", "mp4", owned=journal_outputs(journal)), journal)
+    assert (stats.skipped, transcode) == (1, [])
@@ -0,0 +1,55 @@
+from pathlib import Path
+
+from fluxconverter.core.cache import ResultCache, command_key, input_fingerprint
+
+
+def _cmd(src: Path, dst: Path, crf: str = "23") -> list:
+    return ["/usr/bin/ffmpeg", "-y", "-i", str(src), "-crf", crf, str(dst)]
+
+
+def test_command_key_ignores_locations_but_not_options(tmp_path):
+    a, b = tmp_path / "a.mkv", tmp_path / "elsewhere" / "b.mkv"
+    key = command_key("fp", _cmd(a, tmp_path / "a.mp4"), a, tmp_path / "a.mp4", "6.0")
+    assert key == command_key("fp", _cmd(b, tmp_path / "x.mp4"), b, tmp_path / "x.mp4", "6.0")
+    assert key != command_key("fp", _cmd(a, tmp_path / "a.mp4", "28"), a, tmp_path / "a.mp4", "6.0")
+    assert key != command_key("fp", _cmd(a, tmp_path / "a.mkv"), a, tmp_path / "a.mkv", "6.0")
+    assert key != command_key("fp", _cmd(a, tmp_path / "a.mp4"), a, tmp_path / "a.mp4", "7.0")
+    assert key != command_key("fp2", _cmd(a, tmp_path / "a.mp4"), a, tmp_path / "a.mp4", "6.0")
+
+
+def test_fingerprint_follows_content(tmp_path):
+    path = tmp_path / "in.bin"
+    path.write_bytes(b"a" * 4096)
+    first = input_fingerprint(path)
+    assert input_fingerprint(path) == first
+    path.write_bytes(b"b" * 4096)
+    assert input_fingerprint(path) != first
+    assert input_fingerprint(path, full=True) != input_fingerprint(path)
+
+
+def test_fetched_result_is_independent_of_the_cache(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    out = tmp_path / "out.mp4"
+    out.write_bytes(b"encoded")
+    cache.store("ab" * 32, out)
+    # Overwritten in place, as ffmpeg -y does
+    with open(out, "r+b") as f:
+        f.truncate(0)
+    dest = tmp_path / "again.mp4"
+    assert cache.fetch("ab" * 32, dest) in ("reflink", "copy")
+    assert dest.read_bytes() == b"encoded"
+    with open(dest, "r+b") as f:
+        f.truncate(0)
+    assert cache.fetch("ab" * 32, tmp_path / "third.mp4") is not None
+    assert (tmp_path / "third.mp4").read_bytes() == b"encoded"
+    assert cache.fetch("cd" * 32, dest) is None
+
+
+def test_least_recently_used_results_are_evicted(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=10)
+    src = tmp_path / "out.mp4"
+    for key in ("aa", "bb"):
+        src.write_bytes(b"x" * 6)
+        cache.store(key * 32, src)
+    assert cache.fetch("aa" * 32, tmp_path / "a.mp4") is None
+    assert cache.fetch("bb" * 32, tmp_path / "b.mp4") is not None
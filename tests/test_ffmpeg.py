@@ -0,0 +1,52 @@
+import asyncio
+import sys
+
+import pytest
+
+from fluxconverter.core.ffmpeg import FfmpegError, _snapshot, build_cpu_cmd, run_ffmpeg
+
+
+def _script(source: str) -> list:
+    return [sys.executable, "-c", source]
+
+
+async def _collect(cmd):
+    return [snap async for snap in run_ffmpeg(cmd)]
+
+
+def test_snapshot_prefers_out_time_us_and_tolerates_na():
+    snap = _snapshot({
+        "frame": "120", "fps": "N/A", "out_time_us": "5000000", "out_time_ms": "1",
+        "total_size": "N/A", "speed": "2.1x", "progress": "continue",
+    })
+    assert snap.frame == 120 and snap.fps is None
+    assert snap.out_time_ms == 5_000_000
+    assert snap.total_size is None and snap.speed == "2.1x"
+    assert not snap.done
+
+
+def test_run_ffmpeg_yields_one_snapshot_per_tick():
+    cmd = _script(
+        "print('frame=1\\nfps=10.0\\nprogress=continue');"
+        "print('noise');"
+        "print('frame=2\\nout_time_us=2000000\\nprogress=end')"
+    )
+    snaps = asyncio.run(_collect(cmd))
+    assert [s.frame for s in snaps] == [1, 2]
+    assert snaps[0].fps == 10.0 and snaps[0].out_time_ms is None
+    assert snaps[1].out_time_ms == 2_000_000 and snaps[1].done
+
+
+def test_run_ffmpeg_failure_carries_the_log_tail():
+    cmd = _script("import sys; print('first', file=sys.stderr); print('boom', file=sys.stderr); sys.exit(3)")
+    with pytest.raises(FfmpegError) as failed:
+        asyncio.run(_collect(cmd))
+    assert failed.value.returncode == 3
+    assert failed.value.log_tail == ["first", "boom"]
+
+
+def test_build_cpu_cmd_writes_progress_to_stdout():
+    cmd = build_cpu_cmd("in.mkv", "out.mp4", vfilter="scale=-2:720", extra=["-crf", "23"])
+    assert cmd[cmd.index("-progress") + 1] == "pipe:1"
+    assert cmd[cmd.index("-i") + 1] == "in.mkv"
+    assert cmd[-3:] == ["-crf", "23", "out.mp4"]
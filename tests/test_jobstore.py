@@ -0,0 +1,111 @@
+import socket
+
+from fluxconverter.core.jobstore import JobStore
+
+
+def _job(job_id: str, status: str = "queued") -> dict:
+    return {"id": job_id, "status": status, "progress": 0}
+
+
+def _set_owner(store: JobStore, job_id: str, owner: str) -> None:
+    store._db.execute("UPDATE jobs SET owner=? WHERE id=?", (owner, job_id))
+
+
+def test_progress_is_batched_and_status_written_at_once(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    writer = JobStore(path, flush_interval=60)
+    reader = JobStore(path)
+    writer["j"] = _job("j")
+    assert reader["j"]["status"] == "queued"
+
+    writer.update("j", progress=50)
+    assert writer["j"]["progress"] == 50
+    assert reader["j"]["progress"] == 0
+    writer.flush()
+    assert reader["j"]["progress"] == 50
+
+    writer.update("j", status="processing", progress=60)
+    assert reader["j"]["status"] == "processing"
+    assert reader["j"]["progress"] == 60
+    writer.close()
+    reader.close()
+
+
+def test_recover_claims_only_jobs_of_dead_owners(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    old = JobStore(path)
+    old["ours"] = _job("ours", "processing")
+    old["orphan"] = _job("orphan", "processing")
+    old["done"] = _job("done", "completed")
+    old.flush()
+    # No such pid: the process that ran these is gone
+    _set_owner(old, "orphan", f"{socket.gethostname()}:999999999:dead")
+    _set_owner(old, "done", f"{socket.gethostname()}:999999999:dead")
+
+    new = JobStore(path)
+    recovered = new.recover()
+    assert [j["id"] for j in recovered] == ["orphan"]
+    assert recovered[0]["status"] == "queued" and recovered[0]["recovered"]
+    assert new.recover() == []
+    assert not new.owned_elsewhere("orphan")
+    old.close()
+    new.close()
+
+
+def test_recover_claims_jobs_paused_when_their_owner_died(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    old = JobStore(path)
+    old["paused"] = _job("paused", "paused")
+    old["cancelled"] = _job("cancelled", "cancelled")
+    for job_id in ("paused", "cancelled"):
+        _set_owner(old, job_id, f"{socket.gethostname()}:999999999:dead")
+
+    new = JobStore(path)
+    recovered = new.recover()
+    assert [(j["id"], j["status"]) for j in recovered] == [("paused", "queued")]
+    old.close()
+    new.close()
+
+
+def test_changed_since_sees_other_processes_writes(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    a, b = JobStore(path), JobStore(path)
+    a["x"] = _job("x")
+    changed, cursor = b.changed_since(0)
+    assert [j["id"] for j in changed] == ["x"]
+    assert b.changed_since(cursor)[0] == []
+    a.close()
+    b.close()
+
+
+def test_cursor_never_skips_a_batched_write(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    a, b, reader = JobStore(path, flush_interval=60), JobStore(path), JobStore(path)
+    a["x"] = _job("x")
+    b["y"] = _job("y")
+    _, cursor = reader.changed_since(0)
+    assert cursor == reader.current_version()
+    a.update("x", progress=50)  # Waits for the next batched write
+    b.update("y", status="processing")  # Written now
+    changed, cursor = reader.changed_since(cursor)
+    assert [j["id"] for j in changed] == ["y"]
+    a.flush()
+    changed, cursor = reader.changed_since(cursor)
+    assert [(j["id"], j["progress"]) for j in changed] == [("x", 50)]
+    assert cursor == reader.current_version() == a["x"]["version"]
+    for store in (a, b, reader):
+        store.close()
+
+
+def test_owned_elsewhere(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite")
+    store["mine"] = _job("mine")
+    store["remote"] = _job("remote")
+    store["gone"] = _job("gone")
+    _set_owner(store, "remote", "another-host:1:token")
+    _set_owner(store, "gone", f"{socket.gethostname()}:999999999:dead")
+    assert not store.owned_elsewhere("mine")
+    assert store.owned_elsewhere("remote")
+    assert not store.owned_elsewhere("gone")
+    assert not store.owned_elsewhere("missing")
+    store.close()
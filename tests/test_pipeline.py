@@ -0,0 +1,91 @@
+import pytest
+from pydantic import ValidationError
+
+from fluxconverter.core.models import PipelineSpec
+from fluxconverter.core.pipeline import compile_pipeline
+
+
+def _spec(*steps) -> PipelineSpec:
+    return PipelineSpec.model_validate({"steps": list(steps)})
+
+
+def _ladder() -> PipelineSpec:
+    return _spec(
+        {"name": "decode", "kind": "decode"},
+        {"name": "scale_720", "kind": "filter", "after": "decode", "params": {"filter": "scale=-2:720"}},
+        {"name": "encode_720", "kind": "encode", "params": {"bitrate": "2800k"}},
+        {"name": "scale_480", "kind": "filter", "after": "decode", "params": {"filter": "scale=-2:480"}},
+        {"name": "encode_480", "kind": "encode", "params": {"bitrate": "1400k"}},
+    )
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([{"name": "e", "kind": "encode"}], "must start with a decode step"),
+    ([{"name": "d", "kind": "decode"}, {"name": "d", "kind": "encode"}], "duplicate step name"),
+    ([{"name": "d", "kind": "decode"}, {"name": "e", "kind": "encode", "after": "nope"}], "unknown upstream"),
+    ([{"name": "d", "kind": "decode"}, {"name": "e", "kind": "encode"}, {"name": "f", "kind": "filter", "params": {"filter": "null"}}],
+     "cannot consume the output of encode"),
+    ([{"name": "d", "kind": "decode"}, {"name": "f", "kind": "filter"}], "needs a 'filter' param"),
+    ([{"name": "d", "kind": "decode"}], "at least one encode step"),
+])
+def test_invalid_graphs_are_rejected(steps, message):
+    with pytest.raises(ValidationError, match=message):
+        _spec(*steps)
+
+
+def test_fan_out_decodes_once_and_splits_per_branch(tmp_path):
+    compiled = compile_pipeline(_ladder(), "/media/in.mkv", tmp_path)
+    assert compiled.cmd.count("-i") == 1
+    assert compiled.filter_graph == "[0:v]split=2[s0_0][s0_1];[s0_0]scale=-2:720[s1];[s0_1]scale=-2:480[s3]"
+    assert compiled.maps == {"encode_720": "[s1]", "encode_480": "[s3]"}
+    assert compiled.outputs == [str(tmp_path / "in_encode_720.mp4"), str(tmp_path / "in_encode_480.mp4")]
+    # Every output is preceded by its own map and options
+    first = compiled.cmd.index(compiled.outputs[0])
+    assert compiled.cmd[compiled.cmd.index("-map"):first] == ["-map", "[s1]", "-map", "0:a?", "-b:v", "2800k"]
+
+
+def test_unbranched_encode_maps_the_decoded_video(tmp_path):
+    spec = _spec(
+        {"name": "decode", "kind": "decode"},
+        {"name": "a", "kind": "encode", "after": "decode"},
+        {"name": "b", "kind": "encode", "after": "decode", "params": {"format": "webp"}},
+    )
+    compiled = compile_pipeline(spec, "in.mkv", tmp_path)
+    assert compiled.filter_graph == "[0:v]split=2[s0_0][s0_1]"
+    # Image outputs take no audio
+    assert compiled.cmd.count("0:a?") == 1
+
+
+def test_linear_pipeline_compiles_to_a_filter_chain(tmp_path):
+    spec = _spec(
+        {"name": "decode", "kind": "decode"},
+        {"name": "scale", "kind": "filter", "params": {"filter": "scale=-2:720"}},
+        {"name": "denoise", "kind": "filter", "params": {"filter": "hqdn3d"}},
+        {"name": "encode", "kind": "encode", "params": {
+            "vcodec": "libx264", "crf": 23, "preset": "fast", "audio_bitrate": "128k", "args": ["-movflags", "+faststart"],
+        }},
+    )
+    compiled = compile_pipeline(spec, str(tmp_path / "in.mkv"), tmp_path)
+    cmd = compiled.cmd
+    assert cmd[cmd.index("-vf") + 1] == "scale=-2:720,hqdn3d"
+    assert "-filter_complex" not in cmd and compiled.filter_graph is None
+    assert cmd[cmd.index("-vf") + 2:] == [
+        "-c:v", "libx264", "-preset", "fast", "-crf", "23", "-b:a", "128k", "-movflags", "+faststart",
+        str(tmp_path / "in.mp4"),
+    ]
+
+
+def test_single_output_never_overwrites_its_source(tmp_path):
+    spec = _spec({"name": "decode", "kind": "decode"}, {"name": "encode", "kind": "encode"})
+    compiled = compile_pipeline(spec, str(tmp_path / "clip.mp4"), tmp_path)
+    assert compiled.outputs == [str(tmp_path / "clip_encode.mp4")]
+
+
+def test_image_encodes_drop_audio_options(tmp_path):
+    spec = _spec(
+        {"name": "decode", "kind": "decode"},
+        {"name": "thumb", "kind": "encode", "params": {"format": "webp", "quality": 80, "acodec": "aac", "audio_bitrate": "96k"}},
+    )
+    cmd = compile_pipeline(spec, "in.mkv", tmp_path).cmd
+    assert cmd[-3:] == ["-quality", "80", str(tmp_path / "in.webp")]
+    assert "-c:a" not in cmd and "-b:a" not in cmd
@@ -0,0 +1,56 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from fluxconverter.core.models import PipelineSpec
+from fluxconverter.core.pipeline import compile_pipeline
+from fluxconverter.core.presets import PresetRegistry, resolve_spec
+
+LADDER = """
+steps:
+  - {name: decode, kind: decode}
+  - {name: hi, kind: encode, after: decode, params: {output: renditions/hi/out.mp4, bitrate: 5M}}
+  - {name: lo, kind: encode, after: decode, params: {output: renditions/lo/out.mp4, bitrate: 2M}}
+  - {name: thumb, kind: encode, after: decode, params: {format: webp}}
+"""
+
+
+@pytest.fixture
+def registry(tmp_path):
+    presets = tmp_path / "presets"
+    presets.mkdir()
+    (presets / "ladder.yaml").write_text(LADDER)
+    return PresetRegistry([presets])
+
+
+def test_bound_plan_matches_a_fresh_compile(registry, tmp_path):
+    spec = PipelineSpec.model_validate_yaml(LADDER)
+    for source in ("/media/a.mkv", "/media/b.mov"):
+        compiled = registry.compile("ladder", source, tmp_path / "out")
+        assert compiled == compile_pipeline(spec, source, tmp_path / "out")
+    assert compiled.outputs == [
+        str(tmp_path / "out" / "renditions" / "hi" / "out.mp4"),
+        str(tmp_path / "out" / "renditions" / "lo" / "out.mp4"),
+        str(tmp_path / "out" / "b_thumb.webp"),
+    ]
+
+
+def test_plan_is_recompiled_when_the_preset_changes(registry):
+    first = registry.compile("ladder", "in.mkv", Path("/out"))
+    path = registry.path("ladder")
+    path.write_text(LADDER.replace("5M", "6M"))
+    os.utime(path, ns=(path.stat().st_mtime_ns + 10 ** 9,) * 2)
+    assert registry.compile("ladder", "in.mkv", Path("/out")).cmd != first.cmd
+
+
+def test_unknown_preset_and_missing_files(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        resolve_spec("missing.yaml")
+    with pytest.raises(FileNotFoundError):
+        resolve_spec("configs/web")
+    with pytest.raises(KeyError):
+        resolve_spec("no-such-preset")
+    spec, name = resolve_spec("web-1080p")
+    assert name == "web-1080p" and spec.encode_steps()
@@ -0,0 +1,42 @@
+import pytest
+
+from fluxconverter.core import progress
+from fluxconverter.core.ffmpeg import FfmpegProgress
+from fluxconverter.core.progress import ProgressTracker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(progress.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _tick(media_seconds: float, frame: int) -> FfmpegProgress:
+    return FfmpegProgress(frame=frame, out_time_ms=int(media_seconds * 1_000_000))
+
+
+def test_percent_speed_and_eta(clock):
+    tracker = ProgressTracker(duration=100.0)
+    clock[0] += 1
+    tracker.update(_tick(2.0, 50))
+    clock[0] += 4
+    fields = tracker.update(_tick(10.0, 250))
+    assert fields["progress"] == 10.0
+    assert fields["speed"] == 2.0 and fields["fps"] == 50.0
+    assert fields["avg_speed"] == 2.0 and fields["avg_fps"] == 50.0
+    assert fields["eta_seconds"] == 45.0
+
+
+def test_percent_stays_below_100_until_completed(clock):
+    tracker = ProgressTracker(duration=10.0)
+    clock[0] += 1
+    assert tracker.update(_tick(12.0, 10))["progress"] == 99.0
+
+
+def test_unknown_duration_reports_rates_only(clock):
+    tracker = ProgressTracker(duration=0)
+    clock[0] += 2
+    fields = tracker.update(_tick(4.0, 60))
+    assert "progress" not in fields and "eta_seconds" not in fields
+    assert fields["avg_speed"] == 2.0
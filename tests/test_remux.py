@@ -0,0 +1,43 @@
+from fluxconverter.core.probe import MediaInfo, StreamInfo
+from fluxconverter.core.remux import plan_streams
+
+
+def _info(video: dict = None, audio: dict = None) -> MediaInfo:
+    streams = []
+    if video is not None:
+        streams.append(StreamInfo(index=0, codec_type="video", **video))
+    if audio is not None:
+        streams.append(StreamInfo(index=1, codec_type="audio", **audio))
+    return MediaInfo(streams=streams)
+
+
+H264 = {"codec_name": "h264", "profile": "High", "pix_fmt": "yuv420p"}
+
+
+def test_suitable_streams_are_copied():
+    plan = plan_streams(_info(H264, {"codec_name": "aac"}), "mp4", "libx264", "aac")
+    assert (plan.vcodec, plan.acodec, plan.extra) == ("copy", "copy", [])
+
+
+def test_unsuitable_audio_is_reencoded_alone():
+    plan = plan_streams(_info(H264, {"codec_name": "opus"}), "mp4", "libx264", "aac")
+    assert (plan.vcodec, plan.acodec) == ("copy", "aac")
+
+
+def test_ten_bit_and_unknown_profiles_are_reencoded():
+    ten_bit = {**H264, "profile": "High 10", "pix_fmt": "yuv420p10le"}
+    assert plan_streams(_info(ten_bit), "mp4", "libx264", "aac").vcodec == "libx264"
+    assert plan_streams(_info({**H264, "pix_fmt": "yuv422p"}), "mp4", "libx264", "aac").vcodec == "libx264"
+
+
+def test_hevc_copied_into_mp4_is_tagged_hvc1():
+    hevc = {"codec_name": "hevc", "profile": "Main", "pix_fmt": "yuv420p"}
+    plan = plan_streams(_info(hevc), "mp4", "libx265", "aac")
+    assert plan.vcodec == "copy" and plan.extra == ["-tag:v", "hvc1"]
+    assert plan_streams(_info(hevc), "mkv", "libx265", "aac").extra == []
+
+
+def test_container_mismatch_and_missing_probe_transcode():
+    assert plan_streams(_info(H264), "webm", "libvpx-vp9", "libopus").vcodec == "libvpx-vp9"
+    plan = plan_streams(None, "mp4", "libx264", "aac")
+    assert (plan.vcodec, plan.acodec) == ("libx264", "aac")
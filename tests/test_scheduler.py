@@ -0,0 +1,278 @@
+import asyncio
+
+import pytest
+
+from fluxconverter.core.control import CAN_PAUSE, JobControl
+from fluxconverter.core.probe import MediaInfo, StreamInfo
+from fluxconverter.scheduler import (
+    RETRY_AFTER_DEFAULT,
+    RETRY_AFTER_MIN,
+    AdmissionController,
+    ClientQueueFull,
+    JobCost,
+    JobQueue,
+    QueueFull,
+    estimate_cost,
+)
+
+needs_pause = pytest.mark.skipif(not CAN_PAUSE, reason="jobs can't be paused on this platform")
+
+
+def _cost(cpu: float) -> JobCost:
+    return JobCost(cpu=cpu, memory=1, disk=0, work=1.0)
+
+
+def _recorder(order, name):
+    async def job():
+        order.append(name)
+    return job
+
+
+async def _drain(queue: JobQueue) -> None:
+    queue.start()
+    while queue.depth or queue.active:
+        await asyncio.sleep(0.01)
+    await queue.stop()
+
+
+def test_cost_scales_with_resolution_and_encoder():
+    def info(width, height):
+        return MediaInfo(duration=10.0, streams=[StreamInfo(index=0, codec_type="video", width=width, height=height)])
+
+    hd = estimate_cost(info(1920, 1080), "libx264", 100)
+    assert hd.work == 10.0 and hd.disk == 100
+    assert estimate_cost(info(1280, 720), "libx264", 100).memory < hd.memory
+    assert estimate_cost(info(1920, 1080), "libx265", 100).work == 30.0
+    assert estimate_cost(info(1920, 1080), "h264_nvenc", 100).work == 2.5
+    audio = estimate_cost(MediaInfo(duration=10.0), "copy", 100)
+    assert audio.cpu == 1.0
+
+
+def test_admission_keeps_within_cpu_budget(tmp_path):
+    async def main():
+        admission = AdmissionController(4.0, 100, disk_reserve=0)
+        peak = 0.0
+
+        async def job():
+            nonlocal peak
+            async with admission.admit(_cost(2.0), tmp_path):
+                peak = max(peak, admission.cpu_used)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(job() for _ in range(6)))
+        return admission, peak
+
+    admission, peak = asyncio.run(main())
+    assert peak == 4.0
+    assert (admission.cpu_used, admission.memory_used, admission.disk_pending, admission.running) == (0, 0, 0, 0)
+
+
+def test_oversized_job_runs_alone(tmp_path):
+    async def main():
+        admission = AdmissionController(2.0, 100, disk_reserve=0)
+        seen = []
+
+        async def job(cpu):
+            async with admission.admit(_cost(cpu), tmp_path):
+                seen.append(admission.running)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(job(1.0), job(8.0), job(1.0))
+        return seen
+
+    assert asyncio.run(main()) == [1, 1, 1]
+
+
+def test_admission_is_in_arrival_order(tmp_path):
+    async def main():
+        admission = AdmissionController(2.0, 100, disk_reserve=0)
+        order = []
+
+        async def job(name, cpu):
+            async with admission.admit(_cost(cpu), tmp_path):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        # The large job is not starved by the small ones queued behind it
+        await asyncio.gather(job("small", 1.0), job("large", 2.0), job("small2", 1.0), job("small3", 1.0))
+        return order
+
+    assert asyncio.run(main()) == ["small", "large", "small2", "small3"]
+
+
+def test_cancel_while_queued_keeps_semaphore_in_step():
+    async def main():
+        order = []
+        queue = JobQueue(1, preempt=False)
+        for name in ("first", "dropped", "last"):
+            queue.submit(_recorder(order, name), client="c", key=name)
+        assert await queue.cancel("dropped")
+        assert queue.depth == 2 and queue.pending("c") == 2
+        await _drain(queue)
+        # The dropped job's permit is skipped; later jobs still run
+        queue.submit(_recorder(order, "after"), key="after")
+        await _drain(queue)
+        assert not await queue.cancel("dropped")
+        return order, queue.pending("c")
+
+    order, pending = asyncio.run(main())
+    assert order == ["first", "last", "after"]
+    assert pending == 0
+
+
+def test_queue_full_suggests_retry_after():
+    async def main():
+        queue = JobQueue(1, max_depth=2, preempt=False)
+        for _ in range(2):
+            queue.submit(_recorder([], "x"))
+        with pytest.raises(QueueFull) as full:
+            queue.submit(_recorder([], "x"))
+        # Nothing finished yet to estimate from
+        assert full.value.retry_after == RETRY_AFTER_DEFAULT
+        await _drain(queue)
+        for _ in range(2):
+            queue.submit(_recorder([], "x"))
+        return queue.retry_after()
+
+    assert RETRY_AFTER_MIN <= asyncio.run(main()) < RETRY_AFTER_DEFAULT
+
+
+def test_wfq_puts_interactive_ahead_of_queued_bulk():
+    async def main():
+        order = []
+        queue = JobQueue(1, preempt=False)
+        for i in range(4):
+            queue.submit(_recorder(order, f"bulk{i}"), priority="bulk")
+        queue.submit(_recorder(order, "normal"), priority="normal")
+        queue.submit(_recorder(order, "interactive"), priority="interactive")
+        await _drain(queue)
+        return order
+
+    assert asyncio.run(main()) == ["interactive", "normal", "bulk0", "bulk1", "bulk2", "bulk3"]
+
+
+def test_wfq_flooding_client_only_delays_itself():
+    async def main():
+        order = []
+        queue = JobQueue(1, preempt=False)
+        for i in range(3):
+            queue.submit(_recorder(order, f"a{i}"), client="a")
+        queue.submit(_recorder(order, "b0"), client="b")
+        await _drain(queue)
+        return order
+
+    assert asyncio.run(main()) == ["a0", "b0", "a1", "a2"]
+
+
+def test_reprioritize_moves_a_queued_job_up():
+    async def main():
+        order = []
+        queue = JobQueue(1, preempt=False)
+        for i in range(3):
+            queue.submit(_recorder(order, f"bulk{i}"), priority="bulk", key=f"bulk{i}")
+        assert queue.reprioritize("bulk2", "interactive")
+        assert not queue.reprioritize("missing", "interactive")
+        await _drain(queue)
+        return order
+
+    assert asyncio.run(main()) == ["bulk2", "bulk0", "bulk1"]
+
+
+def test_client_queue_full_is_per_client():
+    queue = JobQueue(1, max_per_client=1)
+    queue.check("a")
+    queue.submit(_recorder([], "x"), client="a")
+    with pytest.raises(ClientQueueFull) as full:
+        queue.submit(_recorder([], "x"), client="a")
+    assert isinstance(full.value, QueueFull)
+    assert full.value.client == "a" and full.value.retry_after > 0
+    queue.check("b")
+    queue.submit(_recorder([], "x"), client="a", force=True)
+    assert queue.pending("a") == 2
+
+
+@needs_pause
+def test_bulk_job_is_paused_for_interactive_and_resumed(tmp_path):
+    async def main():
+        admission = AdmissionController(4.0, 100, disk_reserve=0)
+        control = JobControl()
+        events = []
+        bulk_admitted, release_bulk = asyncio.Event(), asyncio.Event()
+
+        async def bulk():
+            async with admission.admit(_cost(4.0), tmp_path, "bulk", control, events.append):
+                bulk_admitted.set()
+                await release_bulk.wait()
+
+        async def interactive():
+            async with admission.admit(_cost(2.0), tmp_path, "interactive"):
+                events.append("interactive")
+                assert control.paused and admission.paused == 1
+                assert admission.cpu_used <= admission.cpu_budget
+
+        task = asyncio.create_task(bulk())
+        await bulk_admitted.wait()
+        await interactive()
+        assert not control.paused and admission.paused == 0
+        release_bulk.set()
+        await task
+        return admission, events
+
+    admission, events = asyncio.run(main())
+    assert events == [True, "interactive", False]
+    assert admission.cpu_used == 0 and admission.running == 0
+
+
+@needs_pause
+def test_promoted_job_is_not_preempted(tmp_path):
+    async def main():
+        admission = AdmissionController(4.0, 100, disk_reserve=0)
+        control = JobControl()
+        bulk_admitted, release_bulk = asyncio.Event(), asyncio.Event()
+
+        async def bulk():
+            async with admission.admit(_cost(4.0), tmp_path, "bulk", control):
+                bulk_admitted.set()
+                await release_bulk.wait()
+
+        async def interactive():
+            async with admission.admit(_cost(2.0), tmp_path, "interactive"):
+                pass
+
+        task = asyncio.create_task(bulk())
+        await bulk_admitted.wait()
+        await admission.promote(control, "interactive")
+        waiting = asyncio.create_task(interactive())
+        await asyncio.sleep(0.05)
+        assert not control.paused and not waiting.done()
+        release_bulk.set()
+        await asyncio.gather(task, waiting)
+
+    asyncio.run(main())
+
+
+@needs_pause
+def test_higher_class_borrows_a_worker_held_by_bulk():
+    async def main():
+        queue = JobQueue(2)
+        release = asyncio.Event()
+        started = asyncio.Event()
+
+        async def bulk():
+            await release.wait()
+
+        async def interactive():
+            started.set()
+
+        queue.start()
+        for _ in range(4):
+            queue.submit(bulk, priority="bulk")
+        await asyncio.sleep(0.01)
+        queue.submit(interactive, priority="interactive")
+        await asyncio.wait_for(started.wait(), 1.0)
+        release.set()
+        await _drain(queue)
+        return queue
+
+    queue = asyncio.run(main())
+    assert queue.active == 0 and queue.active_preemptible == 0